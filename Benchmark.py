@@ -0,0 +1,181 @@
+import argparse
+import gc
+import json
+import sys
+import time
+import tracemalloc
+
+import Bitboard
+import ChessBoard
+import Move
+import Perft
+
+# Perft positions from https://www.chessprogramming.org/Perft_Results, the same ones tester.py checks
+POSITIONS = [
+    ("Position 1", "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"),
+    ("Position 2", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1"),
+    ("Position 3", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1"),
+    ("Position 4", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1"),
+    ("Position 5", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8"),
+    ("Position 6", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10"),
+]
+
+# bitboard: Perft.perft on a Bitboard.Position
+# board: Perft.move_number_test on a ChessBoard running on bitboards
+# objects: Perft.move_number_test on a ChessBoard using the per-piece move generators
+BACKENDS = ["bitboard", "board", "objects"]
+
+# Runs quicker than this, in the baseline or now, are too noisy to compare nodes/s on
+MIN_SECONDS = 0.1
+
+
+def run_perft(backend, fen, depth):
+    if backend == "bitboard":
+        return Perft.perft(Bitboard.Position(fen), depth)
+    return Perft.move_number_test(ChessBoard.ChessBoard(fen, bitboards=backend == "board"), depth)
+
+
+# Counts how many Move objects are created while func runs
+def count_move_allocations(func, *args):
+    original_init = Move.Move.__init__
+    count = [0]
+
+    def counting_init(self, *init_args, **init_kwargs):
+        count[0] += 1
+        original_init(self, *init_args, **init_kwargs)
+
+    Move.Move.__init__ = counting_init
+    try:
+        result = func(*args)
+    finally:
+        Move.Move.__init__ = original_init
+    return result, count[0]
+
+
+# Times perft on one position and depth. After an untimed warm-up run the best of the given number of repeats is
+# kept. A last, instrumented run measures peak memory and Move allocations so the tracing does not affect the timing.
+def benchmark(backend, name, fen, depth, measure_memory=True, repeats=5):
+
+    repeats = max(repeats, 1)
+    nodes = run_perft(backend, fen, depth)[0]
+    elapsed = float("inf")
+    for _ in range(repeats):
+        gc.collect()
+        gc.disable()  # like timeit, so a collection doesn't land in one run and not another
+        try:
+            start = time.perf_counter()
+            run_perft(backend, fen, depth)
+            elapsed = min(elapsed, time.perf_counter() - start)
+        finally:
+            gc.enable()
+
+    entry = {
+        "backend": backend,
+        "position": name,
+        "fen": fen,
+        "depth": depth,
+        "repeats": repeats,
+        "nodes": nodes,
+        "seconds": round(elapsed, 4),
+        "nodes_per_second": round(nodes / elapsed) if elapsed else 0,
+    }
+
+    if measure_memory:
+        tracemalloc.start()
+        _, allocations = count_move_allocations(run_perft, backend, fen, depth)
+        entry["peak_memory_bytes"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        entry["move_allocations_per_node"] = round(allocations / nodes, 3) if nodes else 0
+
+    return entry
+
+
+def result_key(entry):
+    return entry["backend"], entry["position"], entry["depth"]
+
+
+# Compares results against a baseline run. A result is a regression when its nodes/s dropped by more than the
+# threshold fraction, or when its node count no longer matches. Speeds are only compared when both runs took at
+# least min_seconds.
+def compare(results, baseline, threshold, min_seconds=MIN_SECONDS):
+
+    baseline_entries = {result_key(entry): entry for entry in baseline["results"]}
+    regressions = []
+
+    for entry in results:
+        old = baseline_entries.get(result_key(entry))
+        if not old:
+            continue
+
+        if entry["nodes"] != old["nodes"]:
+            regressions.append(f"{entry['position']} depth {entry['depth']} ({entry['backend']}): "
+                               f"{entry['nodes']} nodes, baseline has {old['nodes']}")
+
+        elif min(entry["seconds"], old["seconds"]) < min_seconds:
+            continue
+
+        elif old["nodes_per_second"] and entry["nodes_per_second"] < old["nodes_per_second"] * (1 - threshold):
+            change = entry["nodes_per_second"] / old["nodes_per_second"] - 1
+            regressions.append(f"{entry['position']} depth {entry['depth']} ({entry['backend']}): "
+                               f"{entry['nodes_per_second']} nodes/s, baseline {old['nodes_per_second']} "
+                               f"({change:+.0%})")
+
+    return regressions
+
+
+def print_entry(entry):
+    line = (f"{entry['backend']:9} {entry['position']:20} depth {entry['depth']}: {entry['nodes']:>10} nodes "
+            f"{entry['seconds']:>9.3f}s {entry['nodes_per_second']:>8} nodes/s")
+    if "peak_memory_bytes" in entry:
+        line += (f" {entry['peak_memory_bytes'] / 1024:>9.0f} KiB peak"
+                 f" {entry['move_allocations_per_node']:>7} Moves/node")
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Perft speed benchmark")
+    parser.add_argument("-d", "--depth", type=int, default=3, help="benchmark every depth from 1 up to this one")
+    parser.add_argument("-b", "--backend", choices=BACKENDS, action="append",
+                        help="can be given more than once, defaults to bitboard")
+    parser.add_argument("-e", "--epd", action="append", default=[],
+                        help="also benchmark the positions in an EPD file")
+    parser.add_argument("-o", "--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    parser.add_argument("-t", "--threshold", type=float, default=0.1,
+                        help="fraction of nodes/s that can be lost before a result counts as a regression")
+    parser.add_argument("-r", "--repeats", type=int, default=5, help="timed runs after the warm-up, the best is kept")
+    parser.add_argument("--min-seconds", type=float, default=MIN_SECONDS,
+                        help="results quicker than this are not compared on speed")
+    parser.add_argument("--no-memory", action="store_true", help="skip the peak memory and Move allocation run")
+    args = parser.parse_args()
+
+    positions = list(POSITIONS)
+    for path in args.epd:
+        for line, fen, _ in Perft.read_epd(path):
+            positions.append((f"{path}:{line}", fen))
+
+    results = []
+    for backend in args.backend or ["bitboard"]:
+        for name, fen in positions:
+            for depth in range(1, args.depth + 1):
+                entry = benchmark(backend, name, fen, depth, not args.no_memory, args.repeats)
+                print_entry(entry)
+                results.append(entry)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump({"python": sys.version.split()[0], "results": results}, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file), args.threshold, args.min_seconds)
+        if regressions:
+            print("\nRegressions:")
+            for regression in regressions:
+                print(regression)
+            sys.exit(1)
+        print("\nNo regressions against", args.baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,975 @@
+# Bitboard representation of a chess position.
+# Squares are numbered like the Cell grid in ChessBoard: square = row * 8 + column, so square 0 is a8 (row 0,
+# column 0) and square 63 is h1. Bit n of a bitboard is set when square n is occupied.
+
+import random
+from array import array
+
+import Evaluation
+import Move
+
+WHITE = 0
+BLACK = 1
+
+PAWN = 0
+KNIGHT = 1
+BISHOP = 2
+ROOK = 3
+QUEEN = 4
+KING = 5
+
+EMPTY = -1
+
+FULL = 0xFFFFFFFFFFFFFFFF
+FILE_A = 0x0101010101010101
+FILE_H = 0x8080808080808080
+NOT_FILE_A = FULL ^ FILE_A
+NOT_FILE_H = FULL ^ FILE_H
+
+# Castling right bits
+WHITE_KINGSIDE = 1
+WHITE_QUEENSIDE = 2
+BLACK_KINGSIDE = 4
+BLACK_QUEENSIDE = 8
+
+# Piece index used for bitboards and the square list is color * 6 + piece type
+PIECE_LETTERS = "PNBRQKpnbrqk"
+PROMOTION_PIECES = {'n': KNIGHT, 'b': BISHOP, 'r': ROOK, 'q': QUEEN}
+
+DEFAULT_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+# Piece values for static exchange evaluation, the king worth more than anything it could capture
+SEE_VALUES = Evaluation.MG_VALUES[:KING] + [20000]
+
+# Which moves generate() produces: every move, captures and promotions only, or the other moves
+GENERATE_ALL = 0
+GENERATE_CAPTURES = 1
+GENERATE_QUIETS = 2
+
+
+def row_mask(row):
+    return 0xFF << (row * 8)
+
+
+def square_name(square):
+    row, column = divmod(square, 8)
+    return "abcdefgh"[column] + str(8 - row)
+
+
+def parse_square(name):
+    return (8 - int(name[1])) * 8 + "abcdefgh".index(name[0])
+
+
+# Moves are the 16-bit codes described in Move.py
+def move_promotion(move):
+    return ((move >> 12) & 3) + KNIGHT if move & 0x8000 else 0
+
+
+# Flags of a promotion to a piece type, with or without a capture
+def promotion_flags(promotion, capture=False):
+    return Move.PROMOTION | (promotion - KNIGHT) | (Move.CAPTURE if capture else 0)
+
+
+# Long algebraic name of a move, e.g. e2e4 or a7a8q
+def move_name(move):
+    name = square_name(move & 63) + square_name((move >> 6) & 63)
+    if move & 0x8000:
+        name += Move.PROMOTION_LETTERS[(move >> 12) & 3]
+    return name
+
+
+def _offset_table(offsets):
+    table = []
+    for square in range(64):
+        row, column = divmod(square, 8)
+        mask = 0
+        for d_row, d_column in offsets:
+            if 0 <= row + d_row < 8 and 0 <= column + d_column < 8:
+                mask |= 1 << ((row + d_row) * 8 + column + d_column)
+        table.append(mask)
+    return table
+
+
+def _ray_table(d_row, d_column):
+    table = []
+    for square in range(64):
+        row, column = divmod(square, 8)
+        mask = 0
+        row += d_row
+        column += d_column
+        while 0 <= row < 8 and 0 <= column < 8:
+            mask |= 1 << (row * 8 + column)
+            row += d_row
+            column += d_column
+        table.append(mask)
+    return table
+
+
+KNIGHT_ATTACKS = _offset_table([(-1, -2), (-2, -1), (-2, 1), (-1, 2), (1, 2), (2, 1), (2, -1), (1, -2)])
+KING_ATTACKS = _offset_table([(0, 1), (0, -1), (1, 0), (-1, 0), (1, -1), (-1, 1), (1, 1), (-1, -1)])
+# Squares attacked by a pawn of the given color standing on a square
+PAWN_ATTACKS = [_offset_table([(-1, -1), (-1, 1)]), _offset_table([(1, -1), (1, 1)])]
+
+# Rays that move to higher square numbers, so their first blocker is the lowest set bit
+RAYS_SOUTH = _ray_table(1, 0)
+RAYS_EAST = _ray_table(0, 1)
+RAYS_SOUTH_EAST = _ray_table(1, 1)
+RAYS_SOUTH_WEST = _ray_table(1, -1)
+# Rays that move to lower square numbers, so their first blocker is the highest set bit
+RAYS_NORTH = _ray_table(-1, 0)
+RAYS_WEST = _ray_table(0, -1)
+RAYS_NORTH_EAST = _ray_table(-1, 1)
+RAYS_NORTH_WEST = _ray_table(-1, -1)
+
+# Castling rights that survive a move touching each square
+CASTLING_MASK = [15] * 64
+CASTLING_MASK[0] = 15 ^ BLACK_QUEENSIDE
+CASTLING_MASK[4] = 15 ^ (BLACK_KINGSIDE | BLACK_QUEENSIDE)
+CASTLING_MASK[7] = 15 ^ BLACK_KINGSIDE
+CASTLING_MASK[56] = 15 ^ WHITE_QUEENSIDE
+CASTLING_MASK[60] = 15 ^ (WHITE_KINGSIDE | WHITE_QUEENSIDE)
+CASTLING_MASK[63] = 15 ^ WHITE_KINGSIDE
+
+# Zobrist keys, from a fixed seed so a position hashes the same in every process
+_zobrist_random = random.Random(20210101)
+PIECE_KEYS = [[_zobrist_random.getrandbits(64) for _ in range(64)] for _ in range(12)]
+SIDE_KEY = _zobrist_random.getrandbits(64)  # included when black is to move
+CASTLING_KEYS = [_zobrist_random.getrandbits(64) for _ in range(16)]  # indexed by all four castling right bits
+EP_KEYS = [_zobrist_random.getrandbits(64) for _ in range(8)]  # indexed by the en passant square's column
+
+
+def _between_table():
+    table = [[0] * 64 for _ in range(64)]
+    for square in range(64):
+        for d_row, d_column in [(0, 1), (0, -1), (1, 0), (-1, 0), (1, -1), (-1, 1), (1, 1), (-1, -1)]:
+            row, column = divmod(square, 8)
+            between = 0
+            row += d_row
+            column += d_column
+            while 0 <= row < 8 and 0 <= column < 8:
+                table[square][row * 8 + column] = between
+                between |= 1 << (row * 8 + column)
+                row += d_row
+                column += d_column
+    return table
+
+
+# Squares strictly between two squares on the same row, column or diagonal, 0 for any other pair
+BETWEEN = _between_table()
+
+
+def _slide(square, occupied, positive_rays, negative_rays):
+    attacks = 0
+    for rays in positive_rays:
+        ray = rays[square]
+        blockers = ray & occupied
+        if blockers:
+            ray ^= rays[(blockers & -blockers).bit_length() - 1]
+        attacks |= ray
+    for rays in negative_rays:
+        ray = rays[square]
+        blockers = ray & occupied
+        if blockers:
+            ray ^= rays[blockers.bit_length() - 1]
+        attacks |= ray
+    return attacks
+
+
+def bishop_attacks(square, occupied):
+    return _slide(square, occupied, (RAYS_SOUTH_EAST, RAYS_SOUTH_WEST), (RAYS_NORTH_EAST, RAYS_NORTH_WEST))
+
+
+def rook_attacks(square, occupied):
+    return _slide(square, occupied, (RAYS_SOUTH, RAYS_EAST), (RAYS_NORTH, RAYS_WEST))
+
+
+def queen_attacks(square, occupied):
+    return bishop_attacks(square, occupied) | rook_attacks(square, occupied)
+
+
+class Position:
+
+    def __init__(self, fen=None):
+        self.bitboards = [0] * 12
+        self.occupied = [0, 0]
+        self.squares = [EMPTY] * 64
+
+        self.side = WHITE
+        self.castling = 0
+        self.ep_square = EMPTY  # square a pawn can move to when capturing en passant
+        self.halfmove = 0
+        self.fullmove = 1
+
+        self.hash = 0  # zobrist hash of the pieces, side to move, castling rights and en passant column
+        # Middlegame and endgame piece-square totals and the game phase, see Evaluation.py
+        self.mg = 0
+        self.eg = 0
+        self.phase = 0
+        # (move, captured piece, castling, ep square, halfmove, hash, mg, eg, phase) for each move made
+        self.history = []
+        self.attack_maps = [None, None]  # cached attack_map() for each color, cleared whenever the position changes
+
+        self.read_fen(fen if fen else DEFAULT_FEN)
+
+    def read_fen(self, fen):
+
+        fields = fen.split()
+        if len(fields) < 3:
+            raise ValueError("Invalid FEN string: " + fen)
+
+        self.bitboards = [0] * 12
+        self.occupied = [0, 0]
+        self.squares = [EMPTY] * 64
+        self.mg = 0
+        self.eg = 0
+        self.phase = 0
+        self.history = []
+        self.attack_maps = [None, None]
+
+        ranks = fields[0].split("/")
+        if len(ranks) != 8:
+            raise ValueError("Invalid FEN string: " + fen)
+
+        for row, rank in enumerate(ranks):
+            column = 0
+            for char in rank:
+                if char.isdigit():
+                    column += int(char)
+                elif char in PIECE_LETTERS and column < 8:
+                    self.put_piece(PIECE_LETTERS.index(char), row * 8 + column)
+                    column += 1
+                else:
+                    raise ValueError("Invalid FEN string: " + fen)
+
+        self.side = BLACK if fields[1] == 'b' else WHITE
+
+        self.castling = 0
+        for char, right in (('K', WHITE_KINGSIDE), ('Q', WHITE_QUEENSIDE), ('k', BLACK_KINGSIDE),
+                            ('q', BLACK_QUEENSIDE)):
+            if char in fields[2]:
+                self.castling |= right
+
+        # Drop castling rights whose king or rook is not on its starting square
+        for right, king_square, rook_square, color in ((WHITE_KINGSIDE, 60, 63, WHITE),
+                                                       (WHITE_QUEENSIDE, 60, 56, WHITE),
+                                                       (BLACK_KINGSIDE, 4, 7, BLACK),
+                                                       (BLACK_QUEENSIDE, 4, 0, BLACK)):
+            if self.squares[king_square] != color * 6 + KING or self.squares[rook_square] != color * 6 + ROOK:
+                self.castling &= ~right
+
+        # Only kept when a pawn of the side to move could capture there, the same as after make_move
+        self.ep_square = EMPTY
+        if len(fields) > 3 and fields[3] != '-':
+            ep_square = parse_square(fields[3])
+            if PAWN_ATTACKS[self.side ^ 1][ep_square] & self.bitboards[self.side * 6 + PAWN]:
+                self.ep_square = ep_square
+
+        self.halfmove = 0
+        self.fullmove = 1
+        if len(fields) > 4 and fields[4].isdigit():
+            self.halfmove = int(fields[4])
+        if len(fields) > 5 and fields[5].isdigit():
+            self.fullmove = int(fields[5])
+
+        self.hash = self.compute_hash()
+
+    def compute_hash(self):
+        key = 0
+        for square, piece in enumerate(self.squares):
+            if piece != EMPTY:
+                key ^= PIECE_KEYS[piece][square]
+        if self.side == BLACK:
+            key ^= SIDE_KEY
+        key ^= CASTLING_KEYS[self.castling]
+        if self.ep_square != EMPTY:
+            key ^= EP_KEYS[self.ep_square & 7]
+        return key
+
+    # FEN of the position. The en passant square is only given when a pawn could capture there, as read_fen keeps it.
+    def fen(self):
+        ranks = []
+        for row in range(8):
+            rank = ""
+            empty = 0
+            for piece in self.squares[row * 8:row * 8 + 8]:
+                if piece == EMPTY:
+                    empty += 1
+                else:
+                    rank += (str(empty) if empty else "") + PIECE_LETTERS[piece]
+                    empty = 0
+            ranks.append(rank + (str(empty) if empty else ""))
+
+        castling = "".join(char for char, right in (('K', WHITE_KINGSIDE), ('Q', WHITE_QUEENSIDE),
+                                                     ('k', BLACK_KINGSIDE), ('q', BLACK_QUEENSIDE))
+                           if self.castling & right)
+        ep = square_name(self.ep_square) if self.ep_square != EMPTY else "-"
+        return f"{'/'.join(ranks)} {'wb'[self.side]} {castling or '-'} {ep} {self.halfmove} {self.fullmove}"
+
+    # Copy of the position, its move history included, that can be searched or changed without touching this one.
+    # Only the lists are copied, which is much cheaper than copy.deepcopy.
+    def copy(self):
+        position = Position.__new__(Position)
+        position.__dict__.update(self.__dict__)
+        position.bitboards = self.bitboards[:]
+        position.occupied = self.occupied[:]
+        position.squares = self.squares[:]
+        position.history = self.history[:]
+        position.attack_maps = [None, None]
+        return position
+
+    def put_piece(self, piece, square):
+        self.bitboards[piece] |= 1 << square
+        self.occupied[piece // 6] |= 1 << square
+        self.squares[square] = piece
+        self.mg += Evaluation.MG_SCORES[piece][square]
+        self.eg += Evaluation.EG_SCORES[piece][square]
+        self.phase += Evaluation.PHASES[piece]
+
+    # Tapered score in centipawns from white's point of view, kept up to date by make_move
+    def evaluation(self):
+        return Evaluation.tapered(self.mg, self.eg, self.phase)
+
+    def king_square(self, color):
+        return self.bitboards[color * 6 + KING].bit_length() - 1
+
+    def make_move(self, move):
+        start = move & 63
+        end = (move >> 6) & 63
+        flags = move >> 12
+
+        bitboards = self.bitboards
+        occupied = self.occupied
+        squares = self.squares
+        us = self.side
+        them = us ^ 1
+
+        piece = squares[start]
+        captured = squares[end]
+        self.history.append((move, captured, self.castling, self.ep_square, self.halfmove, self.hash,
+                             self.mg, self.eg, self.phase))
+        self.attack_maps = [None, None]
+        mg_scores = Evaluation.MG_SCORES
+        eg_scores = Evaluation.EG_SCORES
+
+        mg = self.mg + mg_scores[piece][end] - mg_scores[piece][start]
+        eg = self.eg + eg_scores[piece][end] - eg_scores[piece][start]
+
+        key = self.hash ^ SIDE_KEY ^ CASTLING_KEYS[self.castling] ^ PIECE_KEYS[piece][start] ^ PIECE_KEYS[piece][end]
+        if self.ep_square != EMPTY:
+            key ^= EP_KEYS[self.ep_square & 7]
+
+        self.halfmove += 1
+        if captured != EMPTY:
+            bitboards[captured] ^= 1 << end
+            occupied[them] ^= 1 << end
+            key ^= PIECE_KEYS[captured][end]
+            mg -= mg_scores[captured][end]
+            eg -= eg_scores[captured][end]
+            self.phase -= Evaluation.PHASES[captured]
+            self.halfmove = 0
+
+        start_end = (1 << start) | (1 << end)
+        bitboards[piece] ^= start_end
+        occupied[us] ^= start_end
+        squares[start] = EMPTY
+        squares[end] = piece
+
+        ep_square = EMPTY
+        if piece == us * 6 + PAWN:
+            self.halfmove = 0
+
+        if flags == Move.QUIET or flags == Move.CAPTURE:
+            pass
+
+        elif flags == Move.DOUBLE_PAWN_PUSH:
+            # only worth recording when an enemy pawn is next to the pawn that moved
+            if PAWN_ATTACKS[us][(start + end) >> 1] & bitboards[them * 6 + PAWN]:
+                ep_square = (start + end) >> 1
+                key ^= EP_KEYS[ep_square & 7]
+
+        elif flags == Move.EN_PASSANT:
+            captured_square = end + 8 if us == WHITE else end - 8
+            bitboards[them * 6 + PAWN] ^= 1 << captured_square
+            occupied[them] ^= 1 << captured_square
+            squares[captured_square] = EMPTY
+            key ^= PIECE_KEYS[them * 6 + PAWN][captured_square]
+            mg -= mg_scores[them * 6 + PAWN][captured_square]
+            eg -= eg_scores[them * 6 + PAWN][captured_square]
+
+        elif flags & Move.PROMOTION:
+            promoted = us * 6 + (flags & 3) + KNIGHT
+            bitboards[piece] ^= 1 << end
+            bitboards[promoted] |= 1 << end
+            squares[end] = promoted
+            key ^= PIECE_KEYS[piece][end] ^ PIECE_KEYS[promoted][end]
+            mg += mg_scores[promoted][end] - mg_scores[piece][end]
+            eg += eg_scores[promoted][end] - eg_scores[piece][end]
+            self.phase += Evaluation.PHASES[promoted]
+
+        else:  # castling
+            if flags == Move.KING_CASTLE:
+                rook_start, rook_end = start + 3, start + 1
+            else:
+                rook_start, rook_end = start - 4, start - 1
+            rook = us * 6 + ROOK
+            rook_bits = (1 << rook_start) | (1 << rook_end)
+            bitboards[rook] ^= rook_bits
+            occupied[us] ^= rook_bits
+            squares[rook_start] = EMPTY
+            squares[rook_end] = rook
+            key ^= PIECE_KEYS[rook][rook_start] ^ PIECE_KEYS[rook][rook_end]
+            mg += mg_scores[rook][rook_end] - mg_scores[rook][rook_start]
+            eg += eg_scores[rook][rook_end] - eg_scores[rook][rook_start]
+
+        self.castling &= CASTLING_MASK[start] & CASTLING_MASK[end]
+        self.hash = key ^ CASTLING_KEYS[self.castling]
+        self.mg = mg
+        self.eg = eg
+        self.ep_square = ep_square
+        if us == BLACK:
+            self.fullmove += 1
+        self.side = them
+
+    def unmake_move(self):
+        move, captured, castling, ep_square, halfmove, self.hash, self.mg, self.eg, self.phase = self.history.pop()
+        self.attack_maps = [None, None]
+        start = move & 63
+        end = (move >> 6) & 63
+        flags = move >> 12
+
+        bitboards = self.bitboards
+        occupied = self.occupied
+        squares = self.squares
+        them = self.side
+        us = them ^ 1
+
+        piece = squares[end]
+        if flags & Move.PROMOTION:
+            bitboards[piece] ^= 1 << end
+            piece = us * 6 + PAWN
+            bitboards[piece] ^= 1 << start
+        else:
+            bitboards[piece] ^= (1 << start) | (1 << end)
+        occupied[us] ^= (1 << start) | (1 << end)
+        squares[start] = piece
+        squares[end] = captured
+
+        if captured != EMPTY:
+            bitboards[captured] |= 1 << end
+            occupied[them] |= 1 << end
+
+        elif flags == Move.EN_PASSANT:
+            captured_square = end + 8 if us == WHITE else end - 8
+            bitboards[them * 6 + PAWN] |= 1 << captured_square
+            occupied[them] |= 1 << captured_square
+            squares[captured_square] = them * 6 + PAWN
+
+        elif flags == Move.KING_CASTLE or flags == Move.QUEEN_CASTLE:
+            if flags == Move.KING_CASTLE:
+                rook_start, rook_end = start + 3, start + 1
+            else:
+                rook_start, rook_end = start - 4, start - 1
+            rook = us * 6 + ROOK
+            rook_bits = (1 << rook_start) | (1 << rook_end)
+            bitboards[rook] ^= rook_bits
+            occupied[us] ^= rook_bits
+            squares[rook_end] = EMPTY
+            squares[rook_start] = rook
+
+        self.castling = castling
+        self.ep_square = ep_square
+        self.halfmove = halfmove
+        if us == BLACK:
+            self.fullmove -= 1
+        self.side = us
+
+    # Passes the turn without moving, used to look at the moves of the side that is not to move
+    def make_null_move(self):
+        self.history.append((None, EMPTY, self.castling, self.ep_square, self.halfmove, self.hash,
+                             self.mg, self.eg, self.phase))
+        if self.ep_square != EMPTY:
+            self.hash ^= EP_KEYS[self.ep_square & 7]
+        self.hash ^= SIDE_KEY
+        self.ep_square = EMPTY
+        self.side ^= 1
+        self.attack_maps = [None, None]
+
+    def unmake_null_move(self):
+        _, _, self.castling, self.ep_square, self.halfmove, self.hash, self.mg, self.eg, self.phase = \
+            self.history.pop()
+        self.side ^= 1
+        self.attack_maps = [None, None]
+
+    # All squares attacked by the pieces of a color, with sliders blocked by the pieces in occupied
+    def attacks_by(self, color, occupied=None):
+        bitboards = self.bitboards
+        if occupied is None:
+            occupied = self.occupied[0] | self.occupied[1]
+        base = color * 6
+
+        pawns = bitboards[base + PAWN]
+        if color == WHITE:
+            attacks = ((pawns >> 9) & NOT_FILE_H) | ((pawns >> 7) & NOT_FILE_A)
+        else:
+            attacks = ((pawns << 7) & NOT_FILE_H) | ((pawns << 9) & NOT_FILE_A & FULL)
+
+        for piece_type, table in ((KNIGHT, KNIGHT_ATTACKS), (KING, KING_ATTACKS)):
+            pieces = bitboards[base + piece_type]
+            while pieces:
+                bit = pieces & -pieces
+                attacks |= table[bit.bit_length() - 1]
+                pieces ^= bit
+
+        pieces = bitboards[base + BISHOP] | bitboards[base + QUEEN]
+        while pieces:
+            bit = pieces & -pieces
+            attacks |= bishop_attacks(bit.bit_length() - 1, occupied)
+            pieces ^= bit
+
+        pieces = bitboards[base + ROOK] | bitboards[base + QUEEN]
+        while pieces:
+            bit = pieces & -pieces
+            attacks |= rook_attacks(bit.bit_length() - 1, occupied)
+            pieces ^= bit
+
+        return attacks
+
+    # Squares attacked by a color, with sliders seeing through the other king so the map can filter its moves.
+    # Cached until the position changes.
+    def attack_map(self, color):
+        attacks = self.attack_maps[color]
+        if attacks is None:
+            occupied = (self.occupied[0] | self.occupied[1]) ^ self.bitboards[(color ^ 1) * 6 + KING]
+            attacks = self.attacks_by(color, occupied)
+            self.attack_maps[color] = attacks
+        return attacks
+
+    # Checks if a square is attacked by a color by looking outward from the square for each kind of attacker
+    def is_square_attacked(self, square, color):
+        bitboards = self.bitboards
+        base = color * 6
+
+        if PAWN_ATTACKS[color ^ 1][square] & bitboards[base + PAWN]:
+            return True
+        if KNIGHT_ATTACKS[square] & bitboards[base + KNIGHT]:
+            return True
+        if KING_ATTACKS[square] & bitboards[base + KING]:
+            return True
+
+        occupied = self.occupied[0] | self.occupied[1]
+        queens = bitboards[base + QUEEN]
+        diagonal = bitboards[base + BISHOP] | queens
+        if diagonal and bishop_attacks(square, occupied) & diagonal:
+            return True
+        straight = bitboards[base + ROOK] | queens
+        if straight and rook_attacks(square, occupied) & straight:
+            return True
+
+        return False
+
+    # Pieces of both colors attacking a square, with sliders blocked by the pieces in occupied. Pieces not in occupied
+    # are treated as already gone, which lets a static exchange see the sliders behind a piece that has captured.
+    def attackers_to(self, square, occupied):
+        bitboards = self.bitboards
+        diagonal = bitboards[BISHOP] | bitboards[QUEEN] | bitboards[6 + BISHOP] | bitboards[6 + QUEEN]
+        straight = bitboards[ROOK] | bitboards[QUEEN] | bitboards[6 + ROOK] | bitboards[6 + QUEEN]
+        attackers = (PAWN_ATTACKS[BLACK][square] & bitboards[PAWN]) | \
+                    (PAWN_ATTACKS[WHITE][square] & bitboards[6 + PAWN]) | \
+                    (KNIGHT_ATTACKS[square] & (bitboards[KNIGHT] | bitboards[6 + KNIGHT])) | \
+                    (KING_ATTACKS[square] & (bitboards[KING] | bitboards[6 + KING])) | \
+                    (bishop_attacks(square, occupied) & diagonal) | \
+                    (rook_attacks(square, occupied) & straight)
+        return attackers & occupied
+
+    # Static exchange evaluation: the material the side to move wins (or loses, when negative) by playing a capture
+    # and then both sides recapturing on its end square with their least valuable piece, each side free to stop when
+    # going on would lose more. Pins are ignored.
+    def see(self, move):
+        start = move & 63
+        end = (move >> 6) & 63
+        flags = move >> 12
+        bitboards = self.bitboards
+        squares = self.squares
+
+        occupied = (self.occupied[0] | self.occupied[1]) ^ (1 << start)
+        if flags == Move.EN_PASSANT:
+            occupied ^= 1 << (end + 8 if self.side == WHITE else end - 8)
+            gains = [SEE_VALUES[PAWN]]
+        else:
+            gains = [SEE_VALUES[squares[end] % 6] if squares[end] != EMPTY else 0]
+
+        # value of the piece now standing on the end square, which the next capture takes
+        on_square = SEE_VALUES[squares[start] % 6]
+        if flags & Move.PROMOTION:
+            on_square = SEE_VALUES[(flags & 3) + KNIGHT]
+            gains[0] += on_square - SEE_VALUES[PAWN]
+
+        side = self.side ^ 1
+        attackers = self.attackers_to(end, occupied)
+        while True:
+            own = attackers & self.occupied[side]
+            if not own:
+                break
+            for piece_type in range(PAWN, KING + 1):
+                pieces = own & bitboards[side * 6 + piece_type]
+                if pieces:
+                    break
+
+            # a king can only take when nothing recaptures it
+            if piece_type == KING and attackers & self.occupied[side ^ 1]:
+                break
+
+            gains.append(on_square - gains[-1])
+            on_square = SEE_VALUES[piece_type]
+            occupied ^= pieces & -pieces
+            attackers = self.attackers_to(end, occupied)
+            side ^= 1
+
+        # each side only makes its capture when that is better than stopping
+        for i in range(len(gains) - 1, 0, -1):
+            gains[i - 1] = -max(-gains[i - 1], gains[i])
+        return gains[0]
+
+    def king_attacked(self, color):
+        return self.is_square_attacked(self.king_square(color), color ^ 1)
+
+    def in_check(self):
+        return self.king_attacked(self.side)
+
+    # Code for a move from start to end in this position, with the flags worked out from the pieces on the board.
+    # promotion is the piece type a pawn reaching the last row turns into.
+    def encode_move(self, start, end, promotion=QUEEN):
+        piece = self.squares[start]
+        capture = self.squares[end] != EMPTY
+
+        if piece == self.side * 6 + PAWN:
+            if end == self.ep_square:
+                return Move.encode(start, end, Move.EN_PASSANT)
+            if end - start == 16 or start - end == 16:
+                return Move.encode(start, end, Move.DOUBLE_PAWN_PUSH)
+            if end < 8 or end >= 56:
+                return Move.encode(start, end, promotion_flags(promotion, capture))
+        elif piece == self.side * 6 + KING:
+            if end - start == 2:
+                return Move.encode(start, end, Move.KING_CASTLE)
+            if start - end == 2:
+                return Move.encode(start, end, Move.QUEEN_CASTLE)
+
+        return Move.encode(start, end, Move.CAPTURE if capture else Move.QUIET)
+
+    # Pseudo-legal moves of the side to move, for the pieces standing on squares in start_mask
+    def generate_moves(self, start_mask=FULL):
+        return self.generate(start_mask, FULL, 0, None, False)
+
+    # Moves that do not leave the moving side's king in check. Pins and checks are found first, so every move can be
+    # generated legal instead of being made and taken back to test it. stage picks all moves, captures and promotions
+    # or the rest.
+    def legal_moves(self, start_mask=FULL, stage=GENERATE_ALL):
+        return self.generate_legal(self.pins_and_checkers(), start_mask, stage)
+
+    # legal_moves with pins_and_checkers() already worked out, so several stages can share them
+    def generate_legal(self, pins, start_mask=FULL, stage=GENERATE_ALL):
+        king_square, checkers, pinned, pin_rays = pins
+
+        if not checkers:
+            target_mask = FULL
+        elif checkers & (checkers - 1):  # double check, only the king can move
+            start_mask &= 1 << king_square
+            target_mask = 0
+        else:  # single check, capture the checker or block it
+            target_mask = checkers | BETWEEN[king_square][checkers.bit_length() - 1]
+
+        return self.generate(start_mask, target_mask, pinned, pin_rays, True, stage)
+
+    def is_legal(self, move):
+        return move in self.legal_moves(1 << (move & 63))
+
+    # Move code of a move in standard algebraic notation such as "Nbd7", "exd6", "e8=Q+" or "O-O". Only moves of the
+    # pieces that could be making it are generated, the ones of the right type on the file or rank given.
+    # Raises ValueError when the move is illegal, ambiguous or can't be read.
+    def parse_san(self, san):
+        text = san.rstrip("+#!?")
+        king = self.side * 6 + KING
+        if text in ("O-O", "0-0", "O-O-O", "0-0-0"):
+            start = self.bitboards[king].bit_length() - 1
+            end = start + 2 if len(text) == 3 else start - 2
+            move = self.encode_move(start, end) if start >= 0 else None
+            if move is None or not self.is_legal(move):
+                raise ValueError("Illegal move: " + san)
+            return move
+
+        promotion = 0
+        if len(text) > 2 and text[-1].lower() in PROMOTION_PIECES and text[-2] in "=12345678":
+            promotion = PROMOTION_PIECES[text[-1].lower()]
+            text = text[:-2] if text[-2] == '=' else text[:-1]
+
+        piece_type = PAWN
+        if text[:1] in ("N", "B", "R", "Q", "K"):
+            piece_type = PIECE_LETTERS.index(text[0])
+            text = text[1:]
+
+        if len(text) < 2 or text[-2] not in "abcdefgh" or text[-1] not in "12345678":
+            raise ValueError("Invalid move: " + san)
+        end = parse_square(text[-2:])
+
+        start_mask = self.bitboards[self.side * 6 + piece_type]
+        for char in text[:-2].replace("x", ""):
+            if char in "abcdefgh":
+                start_mask &= FILE_A << "abcdefgh".index(char)
+            elif char in "12345678":
+                start_mask &= row_mask(8 - int(char))
+            else:
+                raise ValueError("Invalid move: " + san)
+
+        moves = [move for move in self.legal_moves(start_mask)
+                 if (move >> 6) & 63 == end and move_promotion(move) == promotion]
+        if len(moves) != 1:
+            raise ValueError(("Ambiguous move: " if moves else "Illegal move: ") + san)
+        return moves[0]
+
+    # Yields the legal moves a stage at a time: the hash move, captures and promotions, the killer moves, then the
+    # quiet moves. A stage is only generated once the moves before it have been used, so a caller that stops early,
+    # after a cutoff or on finding that any move exists, never pays for the quiet moves. order_captures and
+    # order_quiets can sort a stage before it is handed out.
+    def staged_moves(self, hash_move=None, killers=(), order_captures=None, order_quiets=None):
+
+        if hash_move is not None and self.is_legal(hash_move):
+            yield hash_move
+
+        pins = self.pins_and_checkers()
+
+        captures = self.generate_legal(pins, FULL, GENERATE_CAPTURES)
+        if order_captures:
+            captures = order_captures(captures)
+        for move in captures:
+            if move != hash_move:
+                yield move
+
+        # killers are quiet moves, any capture or promotion among them was already yielded
+        played = [hash_move]
+        for move in killers:
+            if move and move not in played and not move >> 12 & (Move.CAPTURE | Move.PROMOTION) and \
+                    self.is_legal(move):
+                played.append(move)
+                yield move
+
+        quiets = self.generate_legal(pins, FULL, GENERATE_QUIETS)
+        if order_quiets:
+            quiets = order_quiets(quiets)
+        for move in quiets:
+            if move not in played:
+                yield move
+
+    def has_legal_move(self):
+        for _ in self.staged_moves():
+            return True
+        return False
+
+    # Whether the position has come up the given number of times, counting this one, since the last capture or pawn
+    # move with the same side to move
+    def is_repetition(self, times=2):
+        count = 1
+        history = self.history
+        for i in range(len(history) - 4, max(len(history) - 1 - self.halfmove, -1), -2):
+            if history[i][5] == self.hash:  # the hash before the move was made
+                count += 1
+                if count >= times:
+                    return True
+        return False
+
+    # Fifty move rule, or the position having been seen before since the last capture or pawn move
+    def is_draw(self):
+        return self.halfmove >= 100 or self.is_repetition(2)
+
+    # Finds the pieces giving check to the side to move and the pieces pinned to its king. pin_rays maps each pinned
+    # square to the squares it can still move to: the ones between the king and the pinning piece, and the pinning
+    # piece itself.
+    def pins_and_checkers(self):
+        bitboards = self.bitboards
+        us = self.side
+        base = (us ^ 1) * 6
+        own = self.occupied[us]
+        enemy = self.occupied[us ^ 1]
+        king_square = self.king_square(us)
+
+        checkers = (KNIGHT_ATTACKS[king_square] & bitboards[base + KNIGHT]) | \
+                   (PAWN_ATTACKS[us][king_square] & bitboards[base + PAWN])
+
+        # Enemy sliders that attack the king if only enemy pieces can block them
+        queens = bitboards[base + QUEEN]
+        snipers = (rook_attacks(king_square, enemy) & (bitboards[base + ROOK] | queens)) | \
+                  (bishop_attacks(king_square, enemy) & (bitboards[base + BISHOP] | queens))
+
+        pinned = 0
+        pin_rays = {}
+        while snipers:
+            bit = snipers & -snipers
+            between = BETWEEN[king_square][bit.bit_length() - 1]
+            blockers = between & own
+            if not blockers:
+                checkers |= bit
+            elif not blockers & (blockers - 1):
+                pinned |= blockers
+                pin_rays[blockers.bit_length() - 1] = between | bit
+            snipers ^= bit
+
+        return king_square, checkers, pinned, pin_rays
+
+    # Checks that capturing en passant from start doesn't expose the king. Both pawns leave the same row, so this
+    # can uncover an attack along the row that a pin on a single piece would miss.
+    def en_passant_is_legal(self, start):
+        bitboards = self.bitboards
+        us = self.side
+        base = (us ^ 1) * 6
+        end = self.ep_square
+        captured_square = end + 8 if us == WHITE else end - 8
+        occupied = ((self.occupied[0] | self.occupied[1]) ^ (1 << start) ^ (1 << captured_square)) | (1 << end)
+        king_square = self.king_square(us)
+
+        if KNIGHT_ATTACKS[king_square] & bitboards[base + KNIGHT]:
+            return False
+        if PAWN_ATTACKS[us][king_square] & bitboards[base + PAWN] & ~(1 << captured_square):
+            return False
+        queens = bitboards[base + QUEEN]
+        if bishop_attacks(king_square, occupied) & (bitboards[base + BISHOP] | queens):
+            return False
+        if rook_attacks(king_square, occupied) & (bitboards[base + ROOK] | queens):
+            return False
+        return True
+
+    # Moves for the pieces on start_mask. Non-king moves only go to squares in target_mask and pinned pieces stay on
+    # their pin ray. King moves always avoid attacked squares. With legal=True en passant captures are checked too.
+    # The moves come back as an array of 16-bit codes rather than a list of ints.
+    def generate(self, start_mask, target_mask, pinned, pin_rays, legal, stage=GENERATE_ALL):
+        bitboards = self.bitboards
+        us = self.side
+        base = us * 6
+        own = self.occupied[us]
+        enemy = self.occupied[us ^ 1]
+        occupied = own | enemy
+        empty = FULL ^ occupied
+        targets = (FULL ^ own) & target_mask
+
+        if stage == GENERATE_CAPTURES:
+            stage_mask = enemy
+        elif stage == GENERATE_QUIETS:
+            stage_mask = empty
+        else:
+            stage_mask = FULL
+        targets &= stage_mask
+
+        moves = array('H')
+        append = moves.append
+
+        # Pawns
+        pawns = bitboards[base + PAWN] & start_mask
+
+        promotion_row = row_mask(0) if us == WHITE else row_mask(7)
+
+        # Pushes onto the last row are promotions, which count with the captures
+        if stage == GENERATE_CAPTURES:
+            push_mask, capture_mask = promotion_row, FULL
+        elif stage == GENERATE_QUIETS:
+            push_mask, capture_mask = FULL ^ promotion_row, 0
+        else:
+            push_mask, capture_mask = FULL, FULL
+
+        if us == WHITE:
+            single = (pawns >> 8) & empty
+            double = ((single & row_mask(5)) >> 8) & empty
+            pawn_targets = ((single & push_mask, 8, Move.QUIET), (double & push_mask, 16, Move.DOUBLE_PAWN_PUSH),
+                            ((pawns >> 9) & NOT_FILE_H & enemy & capture_mask, 9, Move.CAPTURE),
+                            ((pawns >> 7) & NOT_FILE_A & enemy & capture_mask, 7, Move.CAPTURE))
+        else:
+            single = (pawns << 8) & empty
+            double = ((single & row_mask(2)) << 8) & empty
+            pawn_targets = ((single & push_mask, -8, Move.QUIET), (double & push_mask, -16, Move.DOUBLE_PAWN_PUSH),
+                            ((pawns << 7) & NOT_FILE_H & enemy & capture_mask, -7, Move.CAPTURE),
+                            ((pawns << 9) & NOT_FILE_A & enemy & capture_mask, -9, Move.CAPTURE))
+
+        for ends, offset, flags in pawn_targets:
+            ends &= target_mask
+            promotions = ends & promotion_row
+            ends ^= promotions
+            flags <<= 12
+            while ends:
+                bit = ends & -ends
+                end = bit.bit_length() - 1
+                start = end + offset
+                if not (pinned >> start & 1 and not pin_rays[start] & bit):
+                    append(start | (end << 6) | flags)
+                ends ^= bit
+            while promotions:
+                bit = promotions & -promotions
+                end = bit.bit_length() - 1
+                start = end + offset
+                if not (pinned >> start & 1 and not pin_rays[start] & bit):
+                    move = start | (end << 6) | flags | (Move.PROMOTION << 12)
+                    for promotion in (QUEEN, KNIGHT, ROOK, BISHOP):
+                        append(move | ((promotion - KNIGHT) << 12))
+                promotions ^= bit
+
+        if self.ep_square != EMPTY and stage != GENERATE_QUIETS:
+            capturers = PAWN_ATTACKS[us ^ 1][self.ep_square] & pawns
+            while capturers:
+                bit = capturers & -capturers
+                start = bit.bit_length() - 1
+                if not legal or self.en_passant_is_legal(start):
+                    append(start | (self.ep_square << 6) | (Move.EN_PASSANT << 12))
+                capturers ^= bit
+
+        capture = Move.CAPTURE << 12
+
+        # Knights, which can never move while pinned
+        pieces = bitboards[base + KNIGHT] & start_mask & ~pinned
+        while pieces:
+            bit = pieces & -pieces
+            start = bit.bit_length() - 1
+            ends = KNIGHT_ATTACKS[start] & targets
+            while ends:
+                end_bit = ends & -ends
+                append(start | ((end_bit.bit_length() - 1) << 6) | (capture if end_bit & enemy else 0))
+                ends ^= end_bit
+            pieces ^= bit
+
+        # Sliding pieces
+        for piece_type, attacks in ((BISHOP, bishop_attacks), (ROOK, rook_attacks), (QUEEN, queen_attacks)):
+            pieces = bitboards[base + piece_type] & start_mask
+            while pieces:
+                bit = pieces & -pieces
+                start = bit.bit_length() - 1
+                ends = attacks(start, occupied) & targets
+                if bit & pinned:
+                    ends &= pin_rays[start]
+                while ends:
+                    end_bit = ends & -ends
+                    append(start | ((end_bit.bit_length() - 1) << 6) | (capture if end_bit & enemy else 0))
+                    ends ^= end_bit
+                pieces ^= bit
+
+        # King, which never moves onto an attacked square
+        king = bitboards[base + KING] & start_mask
+        if king:
+            attacked = self.attack_map(us ^ 1)
+            start = king.bit_length() - 1
+            ends = KING_ATTACKS[start] & ~own & ~attacked & stage_mask
+            while ends:
+                end_bit = ends & -ends
+                append(start | ((end_bit.bit_length() - 1) << 6) | (capture if end_bit & enemy else 0))
+                ends ^= end_bit
+
+            # Castling
+            if self.castling and not attacked & king and stage != GENERATE_CAPTURES:
+                if us == WHITE:
+                    kingside, queenside = WHITE_KINGSIDE, WHITE_QUEENSIDE
+                else:
+                    kingside, queenside = BLACK_KINGSIDE, BLACK_QUEENSIDE
+
+                if self.castling & kingside and not occupied & (0b11 << (start + 1)) and \
+                        not attacked & (0b11 << (start + 1)):
+                    append(start | ((start + 2) << 6) | (Move.KING_CASTLE << 12))
+                if self.castling & queenside and not occupied & (0b111 << (start - 3)) and \
+                        not attacked & (0b11 << (start - 2)):
+                    append(start | ((start - 2) << 6) | (Move.QUEEN_CASTLE << 12))
+
+        return moves
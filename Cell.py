@@ -1,5 +1,3 @@
-import pygame
-
 YELLOW = (245, 255, 10)
 BLUE = (0, 0, 255)
 GREEN = (0, 180, 0)
@@ -10,33 +8,20 @@ DARK_GREEN = (0, 128, 0)
 ORANGE = (255, 185, 0)
 DARK_ORANGE = (165, 120, 0)
 
+# A square of the board. Screen positions and sizes are left to the GUI in main.py.
 class Cell:
-    def __init__(self, x, y, row, column, color, square_length=50):
+    def __init__(self, row, column, color):
 
         self.color = color
         self.original_color = color
-        self.x = x  # Left-most GUI x position of cell
-        self.y = y  # Top-most GUI y position of cell
         self.row = row
         self.column = column
         self.position = self.row, self.column
-        self.square_length = square_length
-        self.rect = pygame.Rect(self.x, self.y, square_length, square_length)
         self.chess_piece = None
 
-    def get_position(self):
-        return self.x, self.y
-
     def get_grid_position(self):
         return self.row, self.column
 
-    def is_hovered(self):
-        x, y = pygame.mouse.get_pos()
-        if self.rect.collidepoint(x, y):
-            return True
-        else:
-            return False
-
     def color_hover(self):
         if self.chess_piece:
             self.color = BLUE
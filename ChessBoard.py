@@ -1,6 +1,8 @@
 import Cell
 import Pieces
 import Move
+import Bitboard
+import Evaluation
 
 WHITE = (255, 255, 255)
 GREY = (196, 196, 196)
@@ -8,18 +10,28 @@ GREY = (196, 196, 196)
 DEFAULT_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq"
 
 
+# Index of each kind of piece in the Evaluation tables, before adding 6 for black pieces
+PIECE_INDEXES = {Pieces.Pawn: Bitboard.PAWN, Pieces.Knight: Bitboard.KNIGHT, Pieces.Bishop: Bitboard.BISHOP,
+                 Pieces.Rook: Bitboard.ROOK, Pieces.Queen: Bitboard.QUEEN, Pieces.King: Bitboard.KING}
+
+
 class GameState:
     WHITE_CHECK = 1
     BLACK_CHECK = 2
     STALEMATE = 3
     WHITE_WIN = 4
     BLACK_WIN = 5
+    FIFTY_MOVE_DRAW = 6
+    REPETITION_DRAW = 7
+    INSUFFICIENT_MATERIAL = 8
 
 
 class ChessBoard:
 
-    def __init__(self, fen=None, square_side_length=80, line_thickness=0, divider_thickness=0, screen_border=0):
-        self.board = create_chess_board(square_side_length, line_thickness, divider_thickness, screen_border)
+    # With bitboards=True legal moves and game states come from a Bitboard.Position kept in sync with the cells.
+    # With bitboards=False the original per-piece move generators are used.
+    def __init__(self, fen=None, bitboards=True):
+        self.board = create_chess_board()
 
         self.stalemate = False
         self.black_win = False
@@ -30,24 +42,38 @@ class ChessBoard:
         self.black_king = None
 
         self.chess_pieces = []
-        self.read_fen(fen)
+        self.position = None
+        # Middlegame and endgame piece-square totals and the game phase of the pieces on the board, see Evaluation.py
+        self.mg = 0
+        self.eg = 0
+        self.phase = 0
+        self.halfmove = 0  # moves since the last capture or pawn move, for the fifty move rule
+        self.fullmove = 1  # FEN move number, which goes up after each black move
 
         self.en_passant_capture = None  # flag for if theres an en_passant move available on the board
         self.last_move = None
+        self.read_fen(fen, bitboards)
+
+        # Legal moves of the current position, worked out when first asked for. move_cache maps id(piece) to the
+        # piece's valid Moves and code_cache maps start squares to the move codes of the side to move. move_piece
+        # saves both on cache_stack and starts empty ones, and undo_move brings the saved ones back.
+        self.move_cache = {}
+        self.code_cache = None
+        self.cache_stack = []
 
-    # Creates the chessboard layout of the specified FEN string. Does not currently support en-passant specification
-    def read_fen(self, fen):
+    # Creates the chessboard layout of the specified FEN string
+    def read_fen(self, fen, bitboards=True):
 
         try:
-            fen = fen.split(" ")
+            fen = fen.split()
 
         except AttributeError:
             print("Invalid FEN string format. Using default FEN string")
             fen = DEFAULT_FEN
-            fen = fen.split(" ")
+            fen = fen.split()
         if len(fen) < 3:
             fen = DEFAULT_FEN
-            fen = fen.split(" ")
+            fen = fen.split()
 
         piece_string = fen[0]
         piece_string = piece_string.split("/")
@@ -59,12 +85,14 @@ class ChessBoard:
         else:
             self.white_turn = True
 
-        # Set full turn number if given
-        if len(fen) == 6:
-            try:
-                self.turn = int(fen[5])
-            except ValueError:
-                pass
+        # Set full turn number and halfmove clock if given, each on its own so a FEN can leave out the move number
+        self.halfmove = 0
+        self.fullmove = 1
+        if len(fen) > 4 and fen[4].isdigit():
+            self.halfmove = int(fen[4])
+        if len(fen) > 5 and fen[5].isdigit():
+            self.turn = int(fen[5])
+            self.fullmove = int(fen[5])
 
         # castling
         white_castle_queenside = False
@@ -101,6 +129,31 @@ class ChessBoard:
             row += 1
 
         self.chess_pieces = pieces
+        self.last_move = self.read_en_passant(fen[3]) if len(fen) > 3 else None
+        self.mg, self.eg, self.phase = Evaluation.score_pieces(
+            (piece_index(piece), piece.cell.row * 8 + piece.cell.column) for piece in pieces if piece)
+
+        if bitboards:
+            self.position = Bitboard.Position(" ".join(fen))
+
+        self.move_cache = {}
+        self.code_cache = None
+        self.cache_stack = []
+
+    # The pieces only know about en passant through the last move, so a FEN en passant square becomes the double pawn
+    # push that would have left it
+    def read_en_passant(self, square):
+        if square == '-' or len(square) != 2 or square[0] not in "abcdefgh" or square[1] not in "36":
+            return None
+
+        column = "abcdefgh".index(square[0])
+        row = 4 if square[1] == '3' else 3
+        pawn = self.board[row][column].chess_piece
+        if type(pawn) != Pieces.Pawn or pawn.is_white != (row == 4):
+            return None
+
+        step = -2 if pawn.is_white else 2
+        return Move.Move(pawn, (row - step, column), (step, 0))
 
     def make_piece(self, letter, row, col, castling):
 
@@ -156,62 +209,158 @@ class ChessBoard:
 
         return piece
 
-    # gets score of board
-    def evaluation(self):
+    # FEN of the current position
+    def to_fen(self):
+        if self.position:
+            return self.position.fen()
 
-        white_score, black_score = 0, 0
+        ranks = []
+        for row in self.board:
+            rank = ""
+            empty = 0
+            for cell in row:
+                piece = cell.chess_piece
+                if piece and piece.active:
+                    rank += (str(empty) if empty else "") + Bitboard.PIECE_LETTERS[piece_index(piece)]
+                    empty = 0
+                else:
+                    empty += 1
+            ranks.append(rank + (str(empty) if empty else ""))
+
+        castling = ""
+        for king, row in ((self.white_king, 7), (self.black_king, 0)):
+            if king and king.castle and king.times_moved == 0 and king.cell.position == (row, 4):
+                for column, char in ((7, 'K'), (0, 'Q')):
+                    rook = self.board[row][column].chess_piece
+                    if type(rook) == Pieces.Rook and rook.is_white == king.is_white and rook.castle \
+                            and rook.times_moved == 0:
+                        castling += char if king.is_white else char.lower()
+
+        # like Bitboard.Position, the en passant square is only given when a pawn could capture there
+        ep = "-"
+        last_move = self.last_move
+        if last_move and type(last_move.piece) == Pieces.Pawn and abs(last_move.move[0]) == 2:
+            row, column = last_move.new_pos
+            for c in (column - 1, column + 1):
+                pawn = self.board[row][c].chess_piece if 0 <= c < 8 else None
+                if type(pawn) == Pieces.Pawn and pawn.active and pawn.is_white != last_move.piece.is_white:
+                    ep = "abcdefgh"[column] + str(8 - (row + last_move.start_pos[0]) // 2)
+
+        return f"{'/'.join(ranks)} {'w' if self.white_turn else 'b'} {castling or '-'} {ep} {self.halfmove} " \
+               f"{self.fullmove}"
+
+    # New board in the same position. The cells and pieces are copied as they are, so times_moved and the castling
+    # flags carry over, and the bitboard position is copied with its move history so repetitions are still seen.
+    # The moves played to get here can't be undone on the clone. The cached move codes are shared, while cached Moves
+    # point at this board's pieces and are worked out again for the clone's pieces when asked for.
+    def clone(self):
+        board = copy_object(self)
+        board.board = []
+        pieces = {}
+        for row in self.board:
+            cells = []
+            for cell in row:
+                copied_cell = copy_object(cell)
+                piece = cell.chess_piece
+                if piece:
+                    copied_cell.chess_piece = pieces[id(piece)] = copy_object(piece)
+                    copied_cell.chess_piece.cell = copied_cell
+                cells.append(copied_cell)
+            board.board.append(cells)
+
+        # captured pieces are off the cells but stay in the piece list
         for piece in self.chess_pieces:
-            if piece.is_white:
-                white_score += piece.value
-            else:
-                black_score += piece.value
-
-        return white_score - black_score
-
-    def get_state(self):
-
-        all_moves = []
-        if self.white_turn:
-            if not self.white_king.in_check(self.board, [0, 0]):
-                for piece in self.chess_pieces:
-                    if piece.active and piece.is_white:
-                        moves = self.get_valid_moves(piece)
-                        all_moves.append(moves)
-                if not all_moves:
-                    return GameState.STALEMATE
-
-            else:
-                if self.is_checkmate(self.white_king):
-                    # print("CHECKMATE - Black Win")
+            if piece and id(piece) not in pieces:
+                copied = pieces[id(piece)] = copy_object(piece)
+                copied.cell = board.board[piece.cell.row][piece.cell.column]
+
+        board.chess_pieces = [pieces.get(id(piece)) for piece in self.chess_pieces]
+        board.white_king = pieces.get(id(self.white_king))
+        board.black_king = pieces.get(id(self.black_king))
+        # only the piece and squares of the last move are needed, for en passant
+        last_move = self.last_move
+        if last_move and id(last_move.piece) in pieces:
+            board.last_move = Move.Move(pieces[id(last_move.piece)], last_move.start_pos, last_move.move)
+        else:
+            board.last_move = None
 
-                    return GameState.BLACK_WIN
+        board.position = self.position.copy() if self.position else None
+        board.move_cache = {}
+        board.cache_stack = []
+        return board
 
+    # gets score of board in centipawns from white's point of view, kept up to date by move_piece and undo_move
+    def evaluation(self):
+        return Evaluation.tapered(self.mg, self.eg, self.phase)
+
+    # Adds (sign=1) or takes away (sign=-1) a piece standing on its cell from the evaluation totals
+    def update_score(self, piece, sign):
+        index = piece_index(piece)
+        square = piece.cell.row * 8 + piece.cell.column
+        self.mg += sign * Evaluation.MG_SCORES[index][square]
+        self.eg += sign * Evaluation.EG_SCORES[index][square]
+        self.phase += sign * Evaluation.PHASES[index]
+
+    # Zobrist hash of the current position, kept up to date by move_piece and undo_move
+    def get_hash(self):
+        return self.position.hash
+
+    # State of the game for the side to move, worked out in one pass: whether its king is in check is looked at once
+    # and the move search stops at the first legal move. With draws=True positions that are drawn by the fifty move
+    # rule, threefold repetition (only with bitboards) or insufficient material are reported too, ahead of a check.
+    def get_state(self, draws=False):
+
+        if self.position:
+            in_check = self.position.in_check()
+        elif self.white_turn:
+            in_check = self.white_king.in_check(self.board, [0, 0])
         else:
+            in_check = self.black_king.in_check(self.board, [0, 0])
 
-            if not self.black_king.in_check(self.board, [0, 0]):
-                for piece in self.chess_pieces:
-                    if piece.active and not piece.is_white:
-                        moves = self.get_valid_moves(piece)
-                        all_moves.append(moves)
-                if not all_moves:
-                    return GameState.STALEMATE
+        if not self.has_legal_move():
+            if not in_check:
+                return GameState.STALEMATE
+            elif self.white_turn:
+                return GameState.BLACK_WIN
             else:
-                if self.is_checkmate(self.black_king):
-                    # print("CHECKMATE - White Win")
-
-                    return GameState.WHITE_WIN
+                return GameState.WHITE_WIN
+
+        if draws:
+            halfmove = self.position.halfmove if self.position else self.halfmove
+            if halfmove >= 100:
+                return GameState.FIFTY_MOVE_DRAW
+            if self.position and self.position.is_repetition(3):
+                return GameState.REPETITION_DRAW
+            if self.is_insufficient_material():
+                return GameState.INSUFFICIENT_MATERIAL
+
+        if in_check:
+            if self.white_turn:
+                return GameState.WHITE_CHECK
+            else:
+                return GameState.BLACK_CHECK
 
-        if self.white_king.in_check(self.board, [0, 0]):
-            return GameState.WHITE_CHECK
+        return None
 
-        elif self.black_king.in_check(self.board, [0, 0]):
+    # Whether the side to move has any legal move. Uses the cached moves when the position already has them,
+    # otherwise stops at the first one found.
+    def has_legal_move(self):
 
-            return GameState.BLACK_CHECK
+        if self.position:
+            if self.code_cache is not None:
+                return bool(self.code_cache)
+            return self.position.has_legal_move()
 
-        return None
+        for piece in self.chess_pieces:
+            if piece.active and piece.is_white == self.white_turn and self.get_valid_moves(piece):
+                return True
+        return False
 
     def is_checkmate(self, king):
 
+        if king.is_white == self.white_turn:
+            return not self.has_legal_move()
+
         for piece in self.chess_pieces:
             if piece.active and piece.is_white == king.is_white:
                 moves = self.get_valid_moves(piece)
@@ -219,6 +368,22 @@ class ChessBoard:
                     return False
         return True
 
+    # Neither side can checkmate: kings alone, a single knight or bishop, or only bishops all on squares of one color
+    def is_insufficient_material(self):
+
+        minor_pieces = []
+        for piece in self.chess_pieces:
+            if piece.active and not isinstance(piece, Pieces.King):
+                if not isinstance(piece, (Pieces.Knight, Pieces.Bishop)):
+                    return False
+                minor_pieces.append(piece)
+
+        if len(minor_pieces) <= 1:
+            return True
+        if any(isinstance(piece, Pieces.Knight) for piece in minor_pieces):
+            return False
+        return len({(piece.cell.row + piece.cell.column) % 2 for piece in minor_pieces}) == 1
+
     def promotion(self, move, new_cell):
         piece = move.piece
         selection = move.promotion
@@ -237,28 +402,31 @@ class ChessBoard:
         return promoted_piece
 
     def move_piece(self, move, promotion_selection=None):
+        self.cache_stack.append((self.move_cache, self.code_cache))
+        self.move_cache = {}
+        self.code_cache = None
+
         piece = move.piece
+        self.update_score(piece, -1)
         piece.cell.chess_piece = None
         new_cell = self.board[move.new_pos[0]][move.new_pos[1]]
 
         if move.castling:
 
             rook = move.rook
+            self.update_score(rook, -1)
+            rook.cell.chess_piece = None
+            rook.cell = self.board[rook.cell.row][rook.cell.column + move.rook_move[1]]
+            rook.cell.chess_piece = rook
+            rook.times_moved += 1
+            self.update_score(rook, 1)
 
-            if move.move == [0, 2]:  # king castling right
-                # print(" castling right")
-                rook_move = Move.Move(rook, [rook.cell.row, rook.cell.column], move.rook_move)
-            else:  # king castling left
-                rook_move = Move.Move(rook, [rook.cell.row, rook.cell.column], move.rook_move)
-
-            self.move_piece(rook_move)
-            self.white_turn = not self.white_turn
-
-        elif new_cell.chess_piece:
+        elif not move.en_passant:
 
             move.removed_piece = new_cell.chess_piece
 
-        if move.removed_piece and self.chess_pieces:
+        if move.removed_piece:
+            self.update_score(move.removed_piece, -1)
             move.removed_piece.cell.chess_piece = None
             move.removed_piece.active = False
 
@@ -272,55 +440,96 @@ class ChessBoard:
             new_promoted_piece = self.promotion(move, new_cell)
 
             for i in range(len(self.chess_pieces)):
-                if self.chess_pieces[i] == piece:
-                    self.chess_pieces[i].cell.chess_piece = new_promoted_piece
+                if self.chess_pieces[i] is piece:
                     self.chess_pieces[i] = new_promoted_piece
+                    break
+            new_cell.chess_piece = new_promoted_piece
+            self.update_score(new_promoted_piece, 1)
+        else:
+            self.update_score(piece, 1)
+
+        if self.position:
+            self.position.make_move(encode_move(self.position, move))
 
-            # piece.active = False
+        move.previous_halfmove = self.halfmove
+        if type(piece) == Pieces.Pawn or move.removed_piece:
+            self.halfmove = 0
+        else:
+            self.halfmove += 1
+        if not piece.is_white:
+            self.fullmove += 1
 
+        move.previous_move = self.last_move
         self.last_move = move
         self.white_turn = not self.white_turn
 
     def undo_move(self, move):
-        last = self.last_move
-        reverse = [-1 * move.move[0], -1 * move.move[1]]
-
-        if move.promoted:
-
-            reverse_move = Move.Move(move.promoted_to_piece, move.promoted_to_piece.cell.position, reverse)
-
-            move.piece.times_moved += 1
-        else:
-            reverse_move = Move.Move(move.piece, move.piece.cell.position, reverse)
-
-        self.move_piece(reverse_move)
-        move.piece.times_moved -= 2  # undo move is only called after its been moved.
+        piece = move.piece
+        start_cell = self.board[move.start_pos[0]][move.start_pos[1]]
 
         if move.promoted:
 
+            promoted_piece = move.promoted_to_piece
+            self.update_score(promoted_piece, -1)
+            promoted_piece.cell.chess_piece = None
             for i in range(len(self.chess_pieces)):
-                if self.chess_pieces[i] == move.promoted_to_piece:
-                    self.chess_pieces[i] = move.piece
-                    move.piece.cell = move.promoted_to_piece.cell
-
-                    move.piece.cell.chess_piece = move.piece
+                if self.chess_pieces[i] is promoted_piece:
+                    self.chess_pieces[i] = piece
                     break
+        else:
+            self.update_score(piece, -1)
+
+        piece.cell.chess_piece = None
+        piece.cell = start_cell
+        start_cell.chess_piece = piece
+        piece.times_moved -= 1
+        self.update_score(piece, 1)
 
-        elif move.castling:
+        if move.castling:
 
-            rook_move = Move.Move(move.rook, move.piece.cell.position, move.rook_move)
-            self.undo_move(rook_move)
-            self.white_turn = not self.white_turn
+            rook = move.rook
+            self.update_score(rook, -1)
+            rook.cell.chess_piece = None
+            rook.cell = self.board[rook.cell.row][rook.cell.column - move.rook_move[1]]
+            rook.cell.chess_piece = rook
+            rook.times_moved -= 1
+            self.update_score(rook, 1)
 
         if move.removed_piece:
             move.removed_piece.active = True
             move.removed_piece.cell.chess_piece = move.removed_piece
+            self.update_score(move.removed_piece, 1)
 
-        self.last_move = last
+        if self.position:
+            self.position.unmake_move()
+
+        self.halfmove = move.previous_halfmove
+        if not piece.is_white:
+            self.fullmove -= 1
 
-    # Gets all moves that won't leave the piece's king in check
+        self.last_move = move.previous_move
+        self.white_turn = not self.white_turn
+
+        if self.cache_stack:
+            self.move_cache, self.code_cache = self.cache_stack.pop()
+        else:
+            self.move_cache, self.code_cache = {}, None
+
+    # Gets all moves that won't leave the piece's king in check, from the cache when they were already worked out for
+    # this position
     def get_valid_moves(self, selected_piece):
 
+        moves = self.move_cache.get(id(selected_piece))
+        if moves is None:
+            moves = self.generate_valid_moves(selected_piece)
+            self.move_cache[id(selected_piece)] = moves
+        return moves
+
+    def generate_valid_moves(self, selected_piece):
+
+        if self.position:
+            return self.get_position_moves(selected_piece)
+
         last = self.last_move
         turn = self.white_turn
 
@@ -354,6 +563,67 @@ class ChessBoard:
         self.white_turn = turn
         return valid_moves
 
+    def get_position_moves(self, selected_piece):
+
+        start = selected_piece.cell.row * 8 + selected_piece.cell.column
+
+        if selected_piece.is_white == self.white_turn:
+            codes = self.get_legal_codes().get(start, [])
+        else:  # so can see valid moves for opponent even if its not their turn
+            self.position.make_null_move()
+            codes = self.position.legal_moves(1 << start)
+            self.position.unmake_null_move()
+
+        return [self.build_move(code) for code in codes]
+
+    # Move for a move in standard algebraic notation like "Nf3" or "exd8=Q", see Bitboard.Position.parse_san.
+    # Only for boards created with bitboards=True.
+    def parse_san(self, san):
+        return self.build_move(self.position.parse_san(san))
+
+    # Legal move codes of the side to move grouped by start square, generated once per position
+    def get_legal_codes(self):
+        if self.code_cache is None:
+            self.code_cache = {}
+            for code in self.position.legal_moves():
+                self.code_cache.setdefault(code & 63, []).append(code)
+        return self.code_cache
+
+    # Legal move codes of the side to move a stage at a time: hash_move, captures and promotions, killers, then quiet
+    # moves. Later stages are only generated when the caller keeps asking, see Bitboard.Position.staged_moves.
+    def staged_moves(self, hash_move=None, killers=()):
+        return self.position.staged_moves(hash_move, killers)
+
+    # Builds the Move for a move code of a piece on this board. Only done for moves the UI or the object based code
+    # needs, everything else works on the codes.
+    def build_move(self, code):
+
+        start_row, start_column = divmod(Move.start_square(code), 8)
+        end_row, end_column = divmod(Move.end_square(code), 8)
+
+        piece = self.board[start_row][start_column].chess_piece
+        start_pos = [start_row, start_column]
+        move = [end_row - start_row, end_column - start_column]
+
+        if Move.is_castling(code):
+            if Move.flags(code) == Move.KING_CASTLE:
+                rook = self.board[start_row][7].chess_piece
+                rook_move = [0, -2]
+            else:
+                rook = self.board[start_row][0].chess_piece
+                rook_move = [0, 3]
+            return Move.Move(piece, start_pos, move, castling=True, rook=rook, rook_move=rook_move)
+
+        if Move.is_en_passant(code):
+            en_passant_move = Move.Move(piece, start_pos, move, en_passant=True)
+            en_passant_move.removed_piece = self.board[start_row][end_column].chess_piece
+            return en_passant_move
+
+        if Move.is_promotion(code):
+            return Move.Move(piece, start_pos, move, promoted=True, promotion=Move.promotion_letter(code))
+
+        return Move.Move(piece, start_pos, move)
+
     def color_king_check(self, gamestate):
         if gamestate == GameState.WHITE_CHECK:
             self.white_king.cell.color_check()
@@ -372,11 +642,12 @@ class ChessBoard:
 
                     continue
 
-    def check_if_cells_hovered(self):
+    # hovered_position is the (row, column) under the mouse, or None when it is off the board
+    def check_if_cells_hovered(self, hovered_position):
         cell_hovered = None
         for row in self.board:
             for cell in row:
-                if cell.is_hovered():
+                if cell.position == hovered_position:
                     cell.color_hover()
 
                     cell_hovered = cell
@@ -384,18 +655,16 @@ class ChessBoard:
                     cell.reset_color()
         return cell_hovered
 
-    def get_piece_clicked(self):
-        for row in self.board:
-            for cell in row:
-                if cell.is_hovered() and cell.chess_piece and cell.chess_piece.active:
-                    return cell.chess_piece
+    def get_piece_clicked(self, clicked_position):
+        cell = self.get_clicked_cell(clicked_position)
+        if cell and cell.chess_piece and cell.chess_piece.active:
+            return cell.chess_piece
         return None
 
-    def get_clicked_cell(self):
-        for row in self.board:
-            for cell in row:
-                if cell.is_hovered():
-                    return cell
+    def get_clicked_cell(self, clicked_position):
+        if clicked_position:
+            return self.board[clicked_position[0]][clicked_position[1]]
+        return None
 
     def get_number_active_pieces(self):
         white = 0
@@ -411,17 +680,33 @@ class ChessBoard:
         return white, black
 
 
-def create_chess_board(square_side_length=80, line_thickness=0, divider_thickness=0, screen_border=0):
+# Index of a piece in the Evaluation tables
+def piece_index(piece):
+    index = PIECE_INDEXES[type(piece)]
+    return index if piece.is_white else index + 6
+
+
+# Move code of a Move, read against the position before the move is made
+def encode_move(position, move):
+    start = move.start_pos[0] * 8 + move.start_pos[1]
+    end = move.new_pos[0] * 8 + move.new_pos[1]
+    return position.encode_move(start, end, Bitboard.PROMOTION_PIECES.get(move.promotion, Bitboard.QUEEN))
+
+
+# Shallow copy of a ChessBoard, Cell or piece, quicker than copy.copy for these plain objects
+def copy_object(obj):
+    copied = object.__new__(obj.__class__)
+    copied.__dict__ = obj.__dict__.copy()
+    return copied
+
+
+def create_chess_board():
     chess_board = [[] for _ in range(8)]
-    y = divider_thickness + screen_border
     color_white = True
 
     for row in range(8):
-        x = divider_thickness + screen_border
         color_white = not color_white
         for column in range(8):
-            x_coord = x + line_thickness
-            y_coord = y + line_thickness
 
             if color_white:
                 color = WHITE
@@ -429,11 +714,7 @@ def create_chess_board(square_side_length=80, line_thickness=0, divider_thicknes
             else:
                 color = GREY
                 color_white = True
-            cell = Cell.Cell(x_coord, y_coord, row, column, color, square_side_length)
+            cell = Cell.Cell(row, column, color)
             chess_board[row].append(cell)
 
-            x += line_thickness + square_side_length
-
-        y += line_thickness + square_side_length
-
     return chess_board
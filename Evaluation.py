@@ -0,0 +1,139 @@
+# Material and piece-square tables for a tapered evaluation.
+# Scores are in centipawns from white's point of view. Each piece has a middlegame and an endgame score, and the two
+# totals are blended by the game phase worked out from the pieces left on the board, so a king is pushed to shelter
+# while queens and rooks are around and towards the centre once they are gone.
+# Pieces are indexed like Bitboard: color * 6 + piece type, white 0 and black 1, pawn 0 up to king 5.
+
+# Pawn, knight, bishop, rook, queen, king
+MG_VALUES = [82, 337, 365, 477, 1025, 0]
+EG_VALUES = [94, 281, 297, 512, 936, 0]
+
+# How much each piece type counts towards the phase, a full set of pieces adds up to MAX_PHASE
+PHASE_WEIGHTS = [0, 1, 1, 2, 4, 0]
+MAX_PHASE = 24
+
+# Tables from white's side, listed from a8 to h1 like the Cell grid (square = row * 8 + column). Black pieces use the
+# square mirrored to the other side of the board.
+PAWN_MG = [
+    0, 0, 0, 0, 0, 0, 0, 0,
+    50, 50, 50, 50, 50, 50, 50, 50,
+    10, 10, 20, 30, 30, 20, 10, 10,
+    5, 5, 10, 25, 25, 10, 5, 5,
+    0, 0, 0, 20, 20, 0, 0, 0,
+    5, -5, -10, 0, 0, -10, -5, 5,
+    5, 10, 10, -20, -20, 10, 10, 5,
+    0, 0, 0, 0, 0, 0, 0, 0,
+]
+
+PAWN_EG = [
+    0, 0, 0, 0, 0, 0, 0, 0,
+    80, 80, 80, 80, 80, 80, 80, 80,
+    50, 50, 50, 50, 50, 50, 50, 50,
+    30, 30, 30, 30, 30, 30, 30, 30,
+    15, 15, 15, 15, 15, 15, 15, 15,
+    5, 5, 5, 5, 5, 5, 5, 5,
+    0, 0, 0, 0, 0, 0, 0, 0,
+    0, 0, 0, 0, 0, 0, 0, 0,
+]
+
+KNIGHT_MG = [
+    -50, -40, -30, -30, -30, -30, -40, -50,
+    -40, -20, 0, 0, 0, 0, -20, -40,
+    -30, 0, 10, 15, 15, 10, 0, -30,
+    -30, 5, 15, 20, 20, 15, 5, -30,
+    -30, 0, 15, 20, 20, 15, 0, -30,
+    -30, 5, 10, 15, 15, 10, 5, -30,
+    -40, -20, 0, 5, 5, 0, -20, -40,
+    -50, -40, -30, -30, -30, -30, -40, -50,
+]
+
+BISHOP_MG = [
+    -20, -10, -10, -10, -10, -10, -10, -20,
+    -10, 0, 0, 0, 0, 0, 0, -10,
+    -10, 0, 5, 10, 10, 5, 0, -10,
+    -10, 5, 5, 10, 10, 5, 5, -10,
+    -10, 0, 10, 10, 10, 10, 0, -10,
+    -10, 10, 10, 10, 10, 10, 10, -10,
+    -10, 5, 0, 0, 0, 0, 5, -10,
+    -20, -10, -10, -10, -10, -10, -10, -20,
+]
+
+ROOK_MG = [
+    0, 0, 0, 0, 0, 0, 0, 0,
+    5, 10, 10, 10, 10, 10, 10, 5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    0, 0, 0, 5, 5, 0, 0, 0,
+]
+
+QUEEN_MG = [
+    -20, -10, -10, -5, -5, -10, -10, -20,
+    -10, 0, 0, 0, 0, 0, 0, -10,
+    -10, 0, 5, 5, 5, 5, 0, -10,
+    -5, 0, 5, 5, 5, 5, 0, -5,
+    0, 0, 5, 5, 5, 5, 0, -5,
+    -10, 5, 5, 5, 5, 5, 0, -10,
+    -10, 0, 5, 0, 0, 0, 0, -10,
+    -20, -10, -10, -5, -5, -10, -10, -20,
+]
+
+KING_MG = [
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -20, -30, -30, -40, -40, -30, -30, -20,
+    -10, -20, -20, -20, -20, -20, -20, -10,
+    20, 20, 0, 0, 0, 0, 20, 20,
+    20, 30, 10, 0, 0, 10, 30, 20,
+]
+
+KING_EG = [
+    -50, -40, -30, -20, -20, -30, -40, -50,
+    -30, -20, -10, 0, 0, -10, -20, -30,
+    -30, -10, 20, 30, 30, 20, -10, -30,
+    -30, -10, 30, 40, 40, 30, -10, -30,
+    -30, -10, 30, 40, 40, 30, -10, -30,
+    -30, -10, 20, 30, 30, 20, -10, -30,
+    -30, -30, 0, 0, 0, 0, -30, -30,
+    -50, -30, -30, -30, -30, -30, -30, -50,
+]
+
+# Knights, bishops, rooks and queens keep the same square preferences in the endgame
+MG_TABLES = [PAWN_MG, KNIGHT_MG, BISHOP_MG, ROOK_MG, QUEEN_MG, KING_MG]
+EG_TABLES = [PAWN_EG, KNIGHT_MG, BISHOP_MG, ROOK_MG, QUEEN_MG, KING_EG]
+
+
+def _score_table(values, tables):
+    scores = [[values[piece_type] + table[square] for square in range(64)]
+              for piece_type, table in enumerate(tables)]
+    scores += [[-(values[piece_type] + table[square ^ 56]) for square in range(64)]
+               for piece_type, table in enumerate(tables)]
+    return scores
+
+
+# Signed score of each piece on each square, positive for white pieces and negative for black ones, so a position's
+# totals can be kept up to date by adding and subtracting entries as pieces move
+MG_SCORES = _score_table(MG_VALUES, MG_TABLES)
+EG_SCORES = _score_table(EG_VALUES, EG_TABLES)
+PHASES = PHASE_WEIGHTS * 2
+
+
+# Blends the middlegame and endgame totals by the phase, capped at MAX_PHASE once promotions add extra pieces
+def tapered(mg, eg, phase):
+    if phase > MAX_PHASE:
+        phase = MAX_PHASE
+    return (mg * phase + eg * (MAX_PHASE - phase)) // MAX_PHASE
+
+
+# Totals for a list of (piece, square) pairs, for setting up a position before it is updated move by move
+def score_pieces(pieces):
+    mg, eg, phase = 0, 0, 0
+    for piece, square in pieces:
+        mg += MG_SCORES[piece][square]
+        eg += EG_SCORES[piece][square]
+        phase += PHASES[piece]
+    return mg, eg, phase
@@ -1,4 +1,61 @@
+# Compact 16-bit move codes used by Bitboard, Perft and anything else that handles many moves at once.
+# Bits 0-5 hold the start square and bits 6-11 the end square (square = row * 8 + column), bits 12-15 hold the flags
+# below. A promotion's flags are PROMOTION plus the promoted piece type minus one (knight 0 up to queen 3), with
+# CAPTURE added when the promotion also captures. Move objects are only built from codes when a board needs them.
+QUIET = 0
+DOUBLE_PAWN_PUSH = 1
+KING_CASTLE = 2
+QUEEN_CASTLE = 3
+CAPTURE = 4
+EN_PASSANT = 5
+PROMOTION = 8
+
+PROMOTION_LETTERS = ['n', 'b', 'r', 'q']
+
+
+def encode(start, end, flags=QUIET):
+    return start | (end << 6) | (flags << 12)
+
+
+def start_square(code):
+    return code & 63
+
+
+def end_square(code):
+    return (code >> 6) & 63
+
+
+def flags(code):
+    return code >> 12
+
+
+def is_capture(code):
+    return bool(code & 0x4000)
+
+
+def is_en_passant(code):
+    return code >> 12 == EN_PASSANT
+
+
+def is_castling(code):
+    return code >> 12 == KING_CASTLE or code >> 12 == QUEEN_CASTLE
+
+
+def is_promotion(code):
+    return bool(code & 0x8000)
+
+
+# Letter of the piece a code promotes to ('n', 'b', 'r' or 'q'), or None
+def promotion_letter(code):
+    if code & 0x8000:
+        return PROMOTION_LETTERS[(code >> 12) & 3]
+    return None
+
+
 class Move:
+    __slots__ = ('piece', 'en_passant', 'castling', 'move', 'start_pos', 'new_pos', 'removed_piece', 'rook',
+                 'rook_move', 'promoted', 'promotion', 'promoted_to_piece', 'previous_move', 'previous_halfmove')
+
     def __init__(self, piece, start_pos, move, en_passant=False, castling=False, rook=None, rook_move=None,
                  promoted=False, promotion='q'):
 
@@ -18,3 +75,6 @@ class Move:
         self.promoted = promoted  # Was promoted
         self.promotion = promotion  # Promotion selection
         self.promoted_to_piece = None  # Promoted piece it turned into
+
+        self.previous_move = None  # Board's last move before this one was made, restored on undo
+        self.previous_halfmove = 0  # Board's halfmove clock before this one was made, restored on undo
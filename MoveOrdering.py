@@ -0,0 +1,104 @@
+import Bitboard
+import Move
+import Pieces
+
+# Piece values by Bitboard piece type, for ordering captures
+PIECE_VALUES = [Pieces.PAWN_VALUE, Pieces.KNIGHT_VALUE, Pieces.BISHOP_VALUE, Pieces.ROOK_VALUE, Pieces.QUEEN_VALUE,
+                Pieces.KING_VALUE]
+
+# Each kind of move is scored above the next: hash move, captures and promotions, killers, then quiet moves by history
+HASH_MOVE_SCORE = 1 << 30
+CAPTURE_SCORE = 1 << 24
+KILLER_SCORE = 1 << 22
+HISTORY_LIMIT = 1 << 20  # history scores are halved when one gets past this, so they stay below the killers
+
+
+# Fixed size table of the best move found in each position, stored at the low bits of the zobrist hash like
+# Perft.PerftCache. Searching the stored move first gives the earliest cutoffs when a position comes up again, at a
+# deeper iteration or through a transposition.
+class HashMoveTable:
+
+    def __init__(self, size=1 << 18):
+        bits = max(size - 1, 1).bit_length()
+        self.mask = (1 << bits) - 1
+        self.keys = [0] * (1 << bits)
+        self.moves = [0] * (1 << bits)
+
+    def get(self, key):
+        index = key & self.mask
+        if self.keys[index] == key:
+            return self.moves[index]
+        return None
+
+    def put(self, key, move):
+        index = key & self.mask
+        self.keys[index] = key
+        self.moves[index] = move
+
+
+# Orders moves for the search: the hash move first, then captures and promotions by MVV-LVA (most valuable victim,
+# then least valuable attacker), then the killer moves of the ply, then quiet moves by their history score.
+class MoveOrderer:
+
+    def __init__(self, max_ply=128):
+        self.hash_moves = HashMoveTable()
+        self.killers = [[0, 0] for _ in range(max_ply)]  # two quiet moves per ply that last caused a cutoff
+        self.history = [0] * 4096  # indexed by the start and end squares of quiet moves, the low 12 bits of a code
+
+    # Forgets the killers and history of the last search but keeps the hash moves
+    def clear(self):
+        self.killers = [[0, 0] for _ in self.killers]
+        self.history = [0] * 4096
+
+    def score_move(self, position, move, ply, hash_move):
+        if move == hash_move:
+            return HASH_MOVE_SCORE
+
+        flags = move >> 12
+        if flags & (Move.CAPTURE | Move.PROMOTION):
+            score = CAPTURE_SCORE
+            if flags & Move.CAPTURE:
+                victim = position.squares[(move >> 6) & 63]
+                victim_value = PIECE_VALUES[victim % 6] if victim != Bitboard.EMPTY else Pieces.PAWN_VALUE
+                score += victim_value * 2048 - PIECE_VALUES[position.squares[move & 63] % 6]
+            if flags & Move.PROMOTION:
+                score += PIECE_VALUES[(flags & 3) + Bitboard.KNIGHT] * 2048
+            return score
+
+        killers = self.killers[ply]
+        if move == killers[0]:
+            return KILLER_SCORE + 1
+        if move == killers[1]:
+            return KILLER_SCORE
+
+        return self.history[move & 4095]
+
+    # Moves sorted best first
+    def order(self, position, moves, ply, hash_move=None):
+        scored = [(self.score_move(position, move, ply, hash_move), move) for move in moves]
+        scored.sort(reverse=True)
+        return [move for _, move in scored]
+
+    # Legal moves of the position in the same order, generated a stage at a time with Position.staged_moves so
+    # nothing past a cutoff is generated
+    def staged_moves(self, position, ply, hash_move=None):
+        def order_captures(moves):
+            return sorted(moves, key=lambda move: self.score_move(position, move, ply, None), reverse=True)
+
+        def order_quiets(moves):
+            history = self.history
+            return sorted(moves, key=lambda move: history[move & 4095], reverse=True)
+
+        return position.staged_moves(hash_move, self.killers[ply], order_captures, order_quiets)
+
+    # Records a quiet move that caused a beta cutoff at the given remaining depth
+    def add_cutoff(self, move, ply, depth):
+        killers = self.killers[ply]
+        if move != killers[0]:
+            killers[1] = killers[0]
+            killers[0] = move
+
+        index = move & 4095
+        self.history[index] += depth * depth
+        if self.history[index] > HISTORY_LIMIT:
+            self.history = [score >> 1 for score in self.history]
@@ -0,0 +1,302 @@
+import argparse
+import multiprocessing
+import os
+import time
+
+import Bitboard
+import ChessBoard
+import Move
+
+
+# Fixed size table of perft results. An entry is stored at the low bits of the position's zobrist hash and replaces
+# whatever was there, so memory use never grows past the size given.
+class PerftCache:
+
+    def __init__(self, size=1 << 20):
+        bits = max(size - 1, 1).bit_length()
+        self.mask = (1 << bits) - 1
+        self.entries = [None] * (1 << bits)
+        self.hits = 0
+
+    def get(self, key, depth):
+        entry = self.entries[key & self.mask]
+        if entry and entry[0] == key and entry[1] == depth:
+            self.hits += 1
+            return entry[2]
+        return None
+
+    def put(self, key, depth, result):
+        self.entries[key & self.mask] = (key, depth, result)
+
+
+# Perft over a bitboard position. Returns the same counters as move_number_test:
+# (nodes, captures, en_passants, castles, promotions, checks, checkmates), where only nodes counts leaves and the
+# other counters are summed over every depth. Subtrees reached again through a transposition are read from the cache
+# when one is given.
+def perft(position, depth, cache=None):
+
+    if depth <= 0:
+        return 1, 0, 0, 0, 0, 0, 0
+
+    if cache is not None:
+        result = cache.get(position.hash, depth)
+        if result is not None:
+            return result
+
+    nodes = 0
+    captures = 0
+    en_passants = 0
+    castles = 0
+    promotions = 0
+    checks = 0
+    checkmates = 0
+
+    for move in position.legal_moves():
+
+        flags = move >> 12
+        if flags & Move.CAPTURE:
+            captures += 1
+            if flags == Move.EN_PASSANT:
+                en_passants += 1
+        elif flags == Move.KING_CASTLE or flags == Move.QUEEN_CASTLE:
+            castles += 1
+
+        if flags & Move.PROMOTION:
+            promotions += 1
+
+        position.make_move(move)
+
+        if position.in_check():
+            checks += 1
+            if not position.legal_moves():
+                checkmates += 1
+
+        if depth == 1:
+            nodes += 1
+        else:
+            result = perft(position, depth - 1, cache)
+            nodes += result[0]
+            captures += result[1]
+            en_passants += result[2]
+            castles += result[3]
+            promotions += result[4]
+            checks += result[5]
+            checkmates += result[6]
+
+        position.unmake_move()
+
+    result = nodes, captures, en_passants, castles, promotions, checks, checkmates
+    if cache is not None:
+        cache.put(position.hash, depth, result)
+    return result
+
+
+# Perft over a ChessBoard, playing its Move objects, so boards with and without bitboards can be checked against
+# perft. Returns the same counters.
+def move_number_test(chess_board, depth):
+
+    if depth == 0:
+
+        return 1, 0, 0, 0, 0, 0, 0
+
+    n = 0
+    checks = 0
+    removed_pieces = 0
+    castles = 0
+    promotions = 0
+    en_passant = 0
+    checkmates = 0
+    all_moves = []
+
+    for piece in chess_board.chess_pieces:
+
+        if piece.is_white == chess_board.white_turn and piece.active:
+
+            # appending during promotion moves wont give accurate results
+            valid_moves = chess_board.get_valid_moves(piece)
+
+            all_moves.extend(valid_moves)
+
+    for m in all_moves:
+
+        chess_board.move_piece(m)
+        state = chess_board.get_state()
+        if state in [ChessBoard.GameState.BLACK_CHECK, ChessBoard.GameState.WHITE_CHECK]:
+            checks += 1
+        elif state in [ChessBoard.GameState.WHITE_WIN, ChessBoard.GameState.BLACK_WIN]:
+            checks += 1
+            checkmates += 1
+
+        if m.removed_piece:
+
+            removed_pieces += 1
+            if m.en_passant:
+
+                en_passant += 1
+
+        if m.castling:
+            castles += 1
+
+        if m.promoted:
+            promotions += 1
+
+        result = move_number_test(chess_board, depth - 1)
+        n += result[0]
+
+        removed_pieces += result[1]
+        en_passant += result[2]
+        castles += result[3]
+        promotions += result[4]
+        checks += result[5]
+        checkmates += result[6]
+        chess_board.undo_move(m)
+
+    return n, removed_pieces, en_passant, castles, promotions, checks, checkmates
+
+
+# Perft counters for playing one move and everything below it, where depth includes the move itself
+def perft_move(position, move, depth, cache=None):
+
+    counts = [0, 0, 0, 0, 0, 0, 0]
+
+    if Move.is_capture(move):
+        counts[1] += 1
+        if Move.is_en_passant(move):
+            counts[2] += 1
+    elif Move.is_castling(move):
+        counts[3] += 1
+
+    if Move.is_promotion(move):
+        counts[4] += 1
+
+    position.make_move(move)
+
+    if position.in_check():
+        counts[5] += 1
+        if not position.legal_moves():
+            counts[6] += 1
+
+    result = perft(position, depth - 1, cache)
+    position.unmake_move()
+
+    return add_counts(counts, result)
+
+
+def add_counts(a, b):
+    return tuple(x + y for x, y in zip(a, b))
+
+
+# Perft counters split by root move
+def divide(position, depth, cache=None):
+    return [(move, perft_move(position, move, depth, cache)) for move in position.legal_moves()]
+
+
+_worker_cache = None
+
+
+def _init_worker(cache_size):
+    global _worker_cache
+    _worker_cache = PerftCache(cache_size) if cache_size else None
+
+
+# Runs in a pool process: rebuilds the position from the FEN, plays the path up to the last move and counts that move
+def _perft_task(task):
+    fen, path, depth = task
+    position = Bitboard.Position(fen)
+    for move in path[:-1]:
+        position.make_move(move)
+    return path, perft_move(position, path[-1], depth, _worker_cache)
+
+
+# Perft split across a process pool. With split_depth=1 each root move is one task; with split_depth=2 each reply to
+# each root move is a task, which keeps every process busy when a few root moves have much larger subtrees.
+# Returns the per root move counters in move generation order.
+def parallel_perft(fen, depth, processes=None, split_depth=2, cache_size=1 << 16):
+
+    position = Bitboard.Position(fen)
+    root_moves = position.legal_moves()
+    results = {}
+    tasks = []
+
+    for move in root_moves:
+        if split_depth < 2 or depth < 2:
+            results[move] = (0, 0, 0, 0, 0, 0, 0)
+            tasks.append((fen, (move,), depth))
+        else:
+            # The root move's own captures, checks etc., without its node
+            results[move] = (0,) + perft_move(position, move, 1)[1:]
+            position.make_move(move)
+            for reply in position.legal_moves():
+                tasks.append((fen, (move, reply), depth - 1))
+            position.unmake_move()
+
+    with multiprocessing.Pool(processes or os.cpu_count(), _init_worker, (cache_size,)) as pool:
+        for path, result in pool.imap_unordered(_perft_task, tasks):
+            results[path[0]] = add_counts(results[path[0]], result)
+
+    return [(move, results[move]) for move in root_moves]
+
+
+def total_counts(divide_results):
+    totals = (0, 0, 0, 0, 0, 0, 0)
+    for _, result in divide_results:
+        totals = add_counts(totals, result)
+    return totals
+
+
+# Reads perft EPD lines such as "<fen> ;D1 20 ;D2 400", yielding (line number, fen, {depth: nodes}) one line at a
+# time. Line numbers count comments and blank lines too, so they point at the line in the file.
+def read_epd(path):
+    with open(path) as file:
+        for number, line in enumerate(file, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+
+            fields = line.split(";")
+            expected = {}
+            for field in fields[1:]:
+                parts = field.split()
+                if len(parts) == 2 and parts[0][:1] in ("D", "d") and parts[0][1:].isdigit():
+                    expected[int(parts[0][1:])] = int(parts[1])
+
+            yield number, fields[0].strip(), expected
+
+
+def print_divide(divide_results):
+    for move, result in divide_results:
+        print(f"{Bitboard.move_name(move)}: {result[0]}")
+    print()
+    print("Nodes, captures, en_passants, castles, promotions, checks, checkmates")
+    print(total_counts(divide_results))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Perft with per move divide output")
+    parser.add_argument("fen", nargs="?", default=Bitboard.DEFAULT_FEN)
+    parser.add_argument("-d", "--depth", type=int, default=4)
+    parser.add_argument("-p", "--processes", type=int, default=os.cpu_count(),
+                        help="number of processes, 1 runs in this process")
+    parser.add_argument("-s", "--split-depth", type=int, default=2, choices=[1, 2],
+                        help="split the work by root moves (1) or by replies to root moves (2)")
+    parser.add_argument("-c", "--cache-size", type=int, default=1 << 16,
+                        help="perft cache entries per process, 0 to disable")
+    args = parser.parse_args()
+    if args.depth < 1:
+        parser.error("depth must be at least 1")
+
+    start = time.perf_counter()
+    if args.processes > 1:
+        results = parallel_perft(args.fen, args.depth, args.processes, args.split_depth, args.cache_size)
+    else:
+        cache = PerftCache(args.cache_size) if args.cache_size else None
+        results = divide(Bitboard.Position(args.fen), args.depth, cache)
+    elapsed = time.perf_counter() - start
+
+    print_divide(results)
+    nodes = total_counts(results)[0]
+    print(f"{elapsed:.2f}s, {nodes / elapsed if elapsed else 0:.0f} nodes/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+import argparse
+import multiprocessing
+import os
+import sys
+import threading
+import time
+
+import Bitboard
+import Perft
+
+
+class SuiteSummary:
+
+    def __init__(self):
+        self.positions = 0
+        self.failures = 0
+        self.nodes = 0
+        self.seconds = 0
+
+    def nodes_per_second(self):
+        return self.nodes / self.seconds if self.seconds else 0
+
+    def positions_per_second(self):
+        return self.positions / self.seconds if self.seconds else 0
+
+
+# Checks one EPD position against its expected node counts, shallowest depth first. The first depth that doesn't match
+# is split by root move so the bad branch can be followed with Perft.py, and deeper depths are skipped.
+# Returns (line, fen, mismatch, divide results, nodes searched) where mismatch is (depth, expected, found) or None.
+def check_position(line, fen, expected, max_depth=None, cache=None):
+    position = Bitboard.Position(fen)
+    nodes = 0
+
+    for depth in sorted(expected):
+        if max_depth is not None and depth > max_depth:
+            break
+
+        found = Perft.perft(position, depth, cache)[0]
+        nodes += found
+        if found != expected[depth]:
+            return line, fen, (depth, expected[depth], found), Perft.divide(position, depth), nodes
+
+    return line, fen, None, None, nodes
+
+
+_worker_cache = None
+
+
+def _init_worker(cache_size):
+    global _worker_cache
+    _worker_cache = Perft.PerftCache(cache_size) if cache_size else None
+
+
+def _check_task(task):
+    line, fen, expected, max_depth = task
+    return check_position(line, fen, expected, max_depth, _worker_cache)
+
+
+def print_result(result, summary, output):
+    line, fen, mismatch, divide_results, nodes = result
+    summary.positions += 1
+    summary.nodes += nodes
+    if mismatch:
+        summary.failures += 1
+        depth, expected, found = mismatch
+        print(f"line {line}: depth {depth} expected {expected} nodes, found {found}: {fen}", file=output)
+        for move, counts in divide_results:
+            print(f"    {Bitboard.move_name(move)}: {counts[0]}", file=output)
+        output.flush()
+
+
+# Runs the EPD suite at path a line at a time. Positions go out to a process pool as they are read, with at most a
+# few per process waiting so the suite is never all in memory, and mismatches are printed as soon as a process
+# reports one. processes=1 runs everything in this process. Returns a SuiteSummary.
+def run_suite(path, max_depth=None, processes=None, cache_size=1 << 16, output=sys.stdout):
+    summary = SuiteSummary()
+    start = time.perf_counter()
+    tasks = ((line, fen, expected, max_depth) for line, fen, expected in Perft.read_epd(path))
+
+    if processes == 1:
+        cache = Perft.PerftCache(cache_size) if cache_size else None
+        for task in tasks:
+            print_result(check_position(*task, cache), summary, output)
+    else:
+        processes = processes or os.cpu_count()
+        waiting = threading.Semaphore(processes * 4)
+        lock = threading.Lock()
+        errors = []
+
+        # called on the pool's result thread as each position finishes
+        def finished(result):
+            with lock:
+                print_result(result, summary, output)
+            waiting.release()
+
+        def failed(error):
+            errors.append(error)
+            waiting.release()
+
+        with multiprocessing.Pool(processes, _init_worker, (cache_size,)) as pool:
+            for task in tasks:
+                waiting.acquire()
+                if errors:
+                    break
+                pool.apply_async(_check_task, (task,), callback=finished, error_callback=failed)
+            pool.close()
+            pool.join()
+
+        if errors:
+            raise errors[0]
+
+    summary.seconds = time.perf_counter() - start
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Checks perft node counts of every position in an EPD file, "
+                                                 "given as lines like \"<fen> ;D1 20 ;D2 400\"")
+    parser.add_argument("epd")
+    parser.add_argument("-d", "--depth", type=int, help="deepest depth to check, defaults to every depth listed")
+    parser.add_argument("-p", "--processes", type=int, default=os.cpu_count(),
+                        help="number of processes, 1 runs in this process")
+    parser.add_argument("-c", "--cache-size", type=int, default=1 << 16,
+                        help="perft cache entries per process, 0 to disable")
+    args = parser.parse_args()
+
+    summary = run_suite(args.epd, args.depth, args.processes, args.cache_size)
+
+    print(f"{summary.positions} positions, {summary.failures} failed, {summary.nodes} nodes in "
+          f"{summary.seconds:.2f}s: {summary.nodes_per_second():.0f} nodes/s, "
+          f"{summary.positions_per_second():.1f} positions/s")
+    if summary.failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
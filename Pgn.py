@@ -0,0 +1,210 @@
+import argparse
+import multiprocessing
+import os
+import re
+import sys
+import threading
+import time
+
+import Bitboard
+import ChessBoard
+
+RESULTS = ("1-0", "0-1", "1/2-1/2", "*")
+
+HEADER = re.compile(r'\[\s*(\w+)\s+"((?:[^"\\]|\\.)*)"\s*\]')
+TOKEN = re.compile(r'[{}();]|[^\s{}();]+')
+MOVE_NUMBER = re.compile(r'^\d+\.+')
+
+
+class PgnGame:
+
+    def __init__(self, index, headers, moves, result):
+        self.index = index  # position of the game in its file, counting from 1
+        self.headers = headers
+        self.moves = moves  # SAN of each move, without move numbers, comments or variations
+        self.result = result
+
+    def fen(self):
+        return self.headers.get("FEN", Bitboard.DEFAULT_FEN)
+
+    def name(self):
+        return f"{self.headers.get('White', '?')} - {self.headers.get('Black', '?')}"
+
+
+# Reads the games of a PGN file one at a time, a line at a time, so an archive of any size can be gone through.
+# Comments, variations, NAGs and move numbers are dropped from the moves.
+def read_pgn(path):
+    index = 0
+    headers = {}
+    moves = []
+    in_comment = False
+    variation_depth = 0
+
+    with open(path, encoding="utf-8", errors="replace") as file:
+        for line in file:
+            if not in_comment and line.startswith("["):
+                if moves:  # a game without a result before the next one's headers
+                    index += 1
+                    yield PgnGame(index, headers, moves, "*")
+                    headers, moves = {}, []
+                match = HEADER.match(line)
+                if match:
+                    headers[match.group(1)] = match.group(2)
+                continue
+            if line.startswith("%"):
+                continue
+
+            for token in TOKEN.findall(line):
+                if in_comment:
+                    in_comment = token != "}"
+                elif token == "{":
+                    in_comment = True
+                elif token == ";":
+                    break
+                elif token == "(":
+                    variation_depth += 1
+                elif token == ")":
+                    variation_depth = max(variation_depth - 1, 0)
+                elif variation_depth or token.startswith("$"):
+                    continue
+                elif token in RESULTS:
+                    index += 1
+                    yield PgnGame(index, headers, moves, token)
+                    headers, moves = {}, []
+                else:
+                    move = MOVE_NUMBER.sub("", token)
+                    if move:
+                        moves.append(move)
+
+    if moves or headers:
+        yield PgnGame(index + 1, headers, moves, "*")
+
+
+# Plays the moves of a game on a ChessBoard. Marked checks and mates are checked against the position they lead to.
+# Returns (game index, moves played, error) where error describes the first bad move, or is None.
+def replay_game(game):
+    try:
+        chess_board = ChessBoard.ChessBoard(game.fen())
+    except ValueError as error:
+        return game.index, 0, f"game {game.index} ({game.name()}): {error}"
+
+    for number, san in enumerate(game.moves):
+        try:
+            move = chess_board.parse_san(san)
+        except ValueError as error:
+            return game.index, number, f"game {game.index} ({game.name()}), ply {number + 1}: {error} " \
+                                       f"in {chess_board.to_fen()}"
+        chess_board.move_piece(move)
+
+        marked = san.rstrip("!?")[-1:]
+        if marked in ("+", "#"):
+            state = chess_board.get_state(draws=False)
+            mate = state in (ChessBoard.GameState.WHITE_WIN, ChessBoard.GameState.BLACK_WIN)
+            if not (mate or state in (ChessBoard.GameState.WHITE_CHECK, ChessBoard.GameState.BLACK_CHECK)) or \
+                    marked == "#" and not mate:
+                return game.index, number + 1, f"game {game.index} ({game.name()}), ply {number + 1}: {san} " \
+                                               f"is marked as {'mate' if marked == '#' else 'check'} but isn't"
+
+    return game.index, len(game.moves), None
+
+
+def _replay_games(games):
+    return [replay_game(game) for game in games]
+
+
+class ReplaySummary:
+
+    def __init__(self):
+        self.games = 0
+        self.moves = 0
+        self.errors = 0
+        self.seconds = 0
+
+    def games_per_second(self):
+        return self.games / self.seconds if self.seconds else 0
+
+    def moves_per_second(self):
+        return self.moves / self.seconds if self.seconds else 0
+
+
+# Groups the games into lists of batch_size, so each task sent to a process is worth the trip
+def batches(games, batch_size):
+    batch = []
+    for game in games:
+        batch.append(game)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# Replays every game of a PGN file. Batches of games go out to a process pool as they are read, with a few per process
+# waiting at most, and illegal moves are printed as soon as a process finds one. processes=1 runs everything in this
+# process. Returns a ReplaySummary.
+def replay_pgn(path, processes=None, batch_size=32, output=sys.stdout):
+    summary = ReplaySummary()
+    start = time.perf_counter()
+
+    def finished(results):
+        for _, moves, error in results:
+            summary.games += 1
+            summary.moves += moves
+            if error:
+                summary.errors += 1
+                print(error, file=output)
+                output.flush()
+
+    if processes == 1:
+        for batch in batches(read_pgn(path), batch_size):
+            finished(_replay_games(batch))
+    else:
+        processes = processes or os.cpu_count()
+        waiting = threading.Semaphore(processes * 4)
+        lock = threading.Lock()
+        errors = []
+
+        # called on the pool's result thread as each batch finishes
+        def batch_finished(results):
+            with lock:
+                finished(results)
+            waiting.release()
+
+        def failed(error):
+            errors.append(error)
+            waiting.release()
+
+        with multiprocessing.Pool(processes) as pool:
+            for batch in batches(read_pgn(path), batch_size):
+                waiting.acquire()
+                if errors:
+                    break
+                pool.apply_async(_replay_games, (batch,), callback=batch_finished, error_callback=failed)
+            pool.close()
+            pool.join()
+
+        if errors:
+            raise errors[0]
+
+    summary.seconds = time.perf_counter() - start
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replays every game of a PGN file, printing illegal moves")
+    parser.add_argument("pgn")
+    parser.add_argument("-p", "--processes", type=int, default=os.cpu_count(),
+                        help="number of processes, 1 runs in this process")
+    parser.add_argument("-b", "--batch-size", type=int, default=32, help="games sent to a process at a time")
+    args = parser.parse_args()
+
+    summary = replay_pgn(args.pgn, args.processes, args.batch_size)
+
+    print(f"{summary.games} games, {summary.moves} moves, {summary.errors} with errors in {summary.seconds:.2f}s: "
+          f"{summary.games_per_second():.1f} games/s, {summary.moves_per_second():.0f} moves/s")
+    if summary.errors:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,73 @@ ROOK_VALUE = 5
 QUEEN_VALUE = 10
 KING_VALUE = 1000
 
+KNIGHT_OFFSETS = [(-1, -2), (-2, -1), (-2, 1), (-1, 2), (1, 2), (2, 1), (2, -1), (1, -2)]
+KING_OFFSETS = [(0, 1), (0, -1), (1, 0), (-1, 0), (1, -1), (-1, 1), (1, 1), (-1, -1)]
+BISHOP_DIRECTIONS = [(1, -1), (-1, 1), (1, 1), (-1, -1)]
+ROOK_DIRECTIONS = [(0, -1), (0, 1), (1, 0), (-1, 0)]
+
+WHITE = 0
+BLACK = 1
+
+
+# Lookup tables built once at import. They are indexed by square = row * 8 + column, like the Cell grid, and hold
+# (row, column, move) entries where move is the offset from the square, ready to pass to Move.Move.
+def _target_table(offsets):
+    table = []
+    for square in range(64):
+        row, column = divmod(square, 8)
+        table.append([(row + d_row, column + d_column, (d_row, d_column)) for d_row, d_column in offsets
+                      if 0 <= row + d_row <= 7 and 0 <= column + d_column <= 7])
+    return table
+
+
+# Squares along one direction from each square, nearest first
+def _ray_table(d_row, d_column):
+    table = []
+    for square in range(64):
+        row, column = divmod(square, 8)
+        ray = []
+        for i in range(1, 8):
+            if not (0 <= row + d_row * i <= 7 and 0 <= column + d_column * i <= 7):
+                break
+            ray.append((row + d_row * i, column + d_column * i, (d_row * i, d_column * i)))
+        table.append(ray)
+    return table
+
+
+# Pawn pushes of a color, the single push first and then the double push from the starting row
+def _pawn_push_table(direction, start_row):
+    table = []
+    for square in range(64):
+        row, column = divmod(square, 8)
+        pushes = []
+        if 0 <= row + direction <= 7:
+            pushes.append((row + direction, column, (direction, 0)))
+            if row == start_row:
+                pushes.append((row + direction * 2, column, (direction * 2, 0)))
+        table.append(pushes)
+    return table
+
+
+def _between_table():
+    table = [[[] for _ in range(64)] for _ in range(64)]
+    for square in range(64):
+        for rays in BISHOP_RAYS[square] + ROOK_RAYS[square]:
+            for i, (row, column, _) in enumerate(rays):
+                table[square][row * 8 + column] = [(r, c) for r, c, _ in rays[:i]]
+    return table
+
+
+KNIGHT_TARGETS = _target_table(KNIGHT_OFFSETS)
+KING_TARGETS = _target_table(KING_OFFSETS)
+PAWN_PUSHES = [_pawn_push_table(-1, 6), _pawn_push_table(1, 1)]  # indexed by WHITE or BLACK
+PAWN_CAPTURES = [_target_table([(-1, -1), (-1, 1)]), _target_table([(1, 1), (1, -1)])]
+# Rays of each square, one list per direction
+BISHOP_RAYS = [list(rays) for rays in zip(*[_ray_table(d_row, d_column) for d_row, d_column in BISHOP_DIRECTIONS])]
+ROOK_RAYS = [list(rays) for rays in zip(*[_ray_table(d_row, d_column) for d_row, d_column in ROOK_DIRECTIONS])]
+# (row, column) of the squares strictly between two squares on the same row, column or diagonal, empty otherwise
+BETWEEN = _between_table()
+
 
 class Piece:
 
@@ -40,36 +107,53 @@ class Piece:
 
     # Checks if piece is in check after making the move (no move by default, current position) passed in function
     def in_check(self, board, move=(0, 0)):
-
-        new_position = [self.cell.row + move[0], self.cell.column + move[1]]
-
-        for row in range(8):
-            for column in range(8):
-                if board[row][column].chess_piece:
-                    piece = board[row][column].chess_piece
-                    if piece != self and piece.active and (piece.is_white == (not self.is_white)):
-
-                        if type(
-                                piece) == King:  # if we call re-call get king moves on the other king, will call an
-                            # endless recursion loop
-
-                            all_new_moves = [(0, 1), (0, -1), (1, 0), (-1, 0), (1, -1), (-1, 1), (1, 1), (-1, -1)]
-                        elif type(piece) == Pawn:
-
-                            if piece.is_white:
-                                all_new_moves = [[-1, -1], [-1, 1]]
-                            else:
-
-                                all_new_moves = [[1, 1], [1, -1]]
-                        else:
-                            all_new_moves = [elem.move for elem in piece.get_all_moves(board)]
-
-                        for other_move in all_new_moves:
-
-                            if new_position == [piece.cell.row + other_move[0], piece.cell.column + other_move[1]]:
-                                # print("CHECK: " + str(c.name))
-                                return True
-        return False
+        return square_attacked(board, self.cell.row + move[0], self.cell.column + move[1], not self.is_white, self)
+
+
+# Checks if the square at row, column is attacked by the given side. Instead of generating every enemy piece's moves,
+# this looks outward from the square for a knight, king or pawn on the squares they attack from and for the first
+# piece along each ray. The ignored piece is treated as an empty square, so a king testing where it can move to
+# doesn't block the ray of a slider attacking it.
+def square_attacked(board, row, column, by_white, ignore=None):
+    square = row * 8 + column
+
+    for table, piece_type in ((KNIGHT_TARGETS, Knight), (KING_TARGETS, King)):
+        for r, c, _ in table[square]:
+            piece = board[r][c].chess_piece
+            if piece and piece.active and piece.is_white == by_white and type(piece) == piece_type:
+                return True
+
+    # An attacking pawn stands where a pawn of the defending side on this square could capture
+    for r, c, _ in PAWN_CAPTURES[BLACK if by_white else WHITE][square]:
+        piece = board[r][c].chess_piece
+        if piece and piece.active and piece.is_white == by_white and type(piece) == Pawn:
+            return True
+
+    for rays, piece_types in ((BISHOP_RAYS[square], (Bishop, Queen)), (ROOK_RAYS[square], (Rook, Queen))):
+        for ray in rays:
+            for r, c, _ in ray:
+                piece = board[r][c].chess_piece
+                if piece and piece.active and piece is not ignore:
+                    if piece.is_white == by_white and type(piece) in piece_types:
+                        return True
+                    break
+
+    return False
+
+
+# Moves along the rays of a sliding piece, up to and including the first enemy piece
+def get_ray_moves(piece, board, rays):
+    moves = []
+    start_pos = [piece.cell.row, piece.cell.column]
+    for ray in rays:
+        for r, c, move in ray:
+            other = board[r][c].chess_piece
+            if other and other.active:
+                if other.is_white != piece.is_white:
+                    moves.append(Move.Move(piece, start_pos, move))
+                break
+            moves.append(Move.Move(piece, start_pos, move))
+    return moves
 
 
 class Pawn(Piece):
@@ -81,74 +165,30 @@ class Pawn(Piece):
     def get_all_moves(self, board, last_move):
 
         moves = []
-
-        if not self.is_white:
-
-            if self.in_bounds([2, 0]) and self.cell.row == 1:  # Don't use self.times_moved == 0 in case setting up
-                # board that's not in default position
-                c = board[self.cell.row + 1][self.cell.column].chess_piece
-                d = board[self.cell.row + 2][self.cell.column].chess_piece
-                if not c or not c.active:
-                    if not d or not d.active:
-                        moves.append(Move.Move(self, [self.cell.row, self.cell.column], [2, 0]))
-
-            if self.in_bounds([1, 0]):
-                c = board[self.cell.row + 1][self.cell.column].chess_piece
-                if not c or not c.active:
-
-                    if self.cell.row + 1 == 7:
-                        for selection in ['q', 'n', 'r', 'b']:
-                            moves.append(Move.Move(self, [self.cell.row, self.cell.column], [1, 0], promoted=True,
-                                                   promotion=selection))
-                    else:
-                        moves.append(Move.Move(self, [self.cell.row, self.cell.column], [1, 0]))
-
-            for move in [[1, 1], [1, -1]]:
-                if self.in_bounds(move):
-                    piece = board[self.cell.row + move[0]][self.cell.column + move[1]].chess_piece
-                    if piece and piece.is_white and piece.active:
-
-                        if self.cell.row + 1 == 7:
-                            for selection in ['q', 'n', 'r', 'b']:
-                                moves.append(Move.Move(self, [self.cell.row, self.cell.column], move, promoted=True,
-                                                       promotion=selection))
-                        else:
-                            moves.append(Move.Move(self, [self.cell.row, self.cell.column], move))
-
-        else:
-
-            if self.in_bounds([-2, 0]) and self.cell.row == 6:  # Don't use self.times_moved == 0 in case setting up
-                # board that's not in default position
-                c = board[self.cell.row - 1][self.cell.column].chess_piece
-                d = board[self.cell.row - 2][self.cell.column].chess_piece
-                if not c or not c.active:
-                    if not d or not d.active:
-                        moves.append(Move.Move(self, [self.cell.row, self.cell.column], [-2, 0]))
-
-            if self.in_bounds([-1, 0]):
-                c = board[self.cell.row - 1][self.cell.column].chess_piece
-
-                if not c or not c.active:
-
-                    if self.cell.row - 1 == 0:
-
-                        for selection in ['q', 'n', 'r', 'b']:
-                            moves.append(Move.Move(self, [self.cell.row, self.cell.column], [-1, 0], promoted=True,
-                                                   promotion=selection))
-
-                    else:
-                        moves.append(Move.Move(self, [self.cell.row, self.cell.column], [-1, 0]))
-            for move in [[-1, -1], [-1, 1]]:
-                if self.in_bounds(move):
-                    piece = board[self.cell.row + move[0]][self.cell.column + move[1]].chess_piece
-                    if piece and not piece.is_white and piece.active:
-                        if self.cell.row - 1 == 0:
-
-                            for selection in ['q', 'n', 'r', 'b']:
-                                moves.append(Move.Move(self, [self.cell.row, self.cell.column], move, promoted=True,
-                                                       promotion=selection))
-                        else:
-                            moves.append(Move.Move(self, [self.cell.row, self.cell.column], move))
+        color = WHITE if self.is_white else BLACK
+        square = self.cell.row * 8 + self.cell.column
+        start_pos = [self.cell.row, self.cell.column]
+
+        # Don't use self.times_moved == 0 for the double push in case setting up board that's not in default position,
+        # the table only has it for pawns on their starting row
+        for r, c, move in PAWN_PUSHES[color][square]:
+            piece = board[r][c].chess_piece
+            if piece and piece.active:
+                break
+            if r == 0 or r == 7:
+                for selection in ['q', 'n', 'r', 'b']:
+                    moves.append(Move.Move(self, start_pos, move, promoted=True, promotion=selection))
+            else:
+                moves.append(Move.Move(self, start_pos, move))
+
+        for r, c, move in PAWN_CAPTURES[color][square]:
+            piece = board[r][c].chess_piece
+            if piece and piece.active and piece.is_white != self.is_white:
+                if r == 0 or r == 7:
+                    for selection in ['q', 'n', 'r', 'b']:
+                        moves.append(Move.Move(self, start_pos, move, promoted=True, promotion=selection))
+                else:
+                    moves.append(Move.Move(self, start_pos, move))
 
         # Check for En passant
         if last_move:
@@ -182,22 +222,7 @@ class Rook(Piece):
         self.castle = True  # used when making board from FEN string
 
     def get_all_moves(self, board):
-
-        moves = []
-        directions = [(0, -1), (0, 1), (1, 0), (-1, 0)]
-        for direction in directions:
-            for i in range(1, 8):
-                move = [direction[0] * i, direction[1] * i]
-                if self.in_bounds(move):
-                    c = board[self.cell.row + move[0]][self.cell.column + move[1]].chess_piece
-                    if c and c.active:
-                        if c.is_white == (not self.is_white):
-                            moves.append(Move.Move(self, [self.cell.row, self.cell.column], move))
-
-                        break
-                    moves.append(Move.Move(self, [self.cell.row, self.cell.column], move))
-
-        return moves
+        return get_ray_moves(self, board, ROOK_RAYS[self.cell.row * 8 + self.cell.column])
 
 
 class Knight(Piece):
@@ -207,17 +232,12 @@ class Knight(Piece):
 
     def get_all_moves(self, board):
 
-        possible_moves = [(-1, -2), (-2, -1), (-2, 1), (-1, 2), (1, 2), (2, 1), (2, -1), (1, -2)]
         valid_moves = []
-        for move in possible_moves:
-            if self.in_bounds(move):
-                c = board[self.cell.row + move[0]][self.cell.column + move[1]]
-                if c.chess_piece and c.chess_piece.active:
-                    if c.chess_piece.is_white == (not self.is_white):
-                        valid_moves.append(Move.Move(self, [self.cell.row, self.cell.column], move))
-
-                else:
-                    valid_moves.append(Move.Move(self, [self.cell.row, self.cell.column], move))
+        start_pos = [self.cell.row, self.cell.column]
+        for r, c, move in KNIGHT_TARGETS[self.cell.row * 8 + self.cell.column]:
+            piece = board[r][c].chess_piece
+            if not piece or not piece.active or piece.is_white != self.is_white:
+                valid_moves.append(Move.Move(self, start_pos, move))
 
         return valid_moves
 
@@ -228,21 +248,7 @@ class Bishop(Piece):
         self.value = BISHOP_VALUE
 
     def get_all_moves(self, board):
-
-        moves = []
-        directions = [(1, -1), (-1, 1), (1, 1), (-1, -1)]
-        for direction in directions:
-            for i in range(1, 8):
-                move = [direction[0] * i, direction[1] * i]
-                if self.in_bounds(move):
-                    c = board[self.cell.row + move[0]][self.cell.column + move[1]].chess_piece
-                    if c and c.active:
-                        if c.is_white == (not self.is_white):
-                            moves.append(Move.Move(self, [self.cell.row, self.cell.column], move))
-                        break
-                    moves.append(Move.Move(self, [self.cell.row, self.cell.column], move))
-
-        return moves
+        return get_ray_moves(self, board, BISHOP_RAYS[self.cell.row * 8 + self.cell.column])
 
 
 class Queen(Piece):
@@ -266,17 +272,12 @@ class King(Piece):
     def get_all_moves(self, board):
 
         moves = []
-        possible_moves = [(0, 1), (0, -1), (1, 0), (-1, 0), (1, -1), (-1, 1), (1, 1), (-1, -1)]
-        for move in possible_moves:
-            if self.in_bounds(move):
-                c = board[self.cell.row + move[0]][self.cell.column + move[1]].chess_piece
-                if c and c.active:
-                    if c.is_white == (not self.is_white):
-                        if not self.in_check(board, move):
-                            moves.append(Move.Move(self, [self.cell.row, self.cell.column], move))
-                else:
-                    if not self.in_check(board, move):
-                        moves.append(Move.Move(self, [self.cell.row, self.cell.column], move))
+        start_pos = [self.cell.row, self.cell.column]
+        for r, c, move in KING_TARGETS[self.cell.row * 8 + self.cell.column]:
+            piece = board[r][c].chess_piece
+            if not piece or not piece.active or piece.is_white != self.is_white:
+                if not self.in_check(board, move):
+                    moves.append(Move.Move(self, start_pos, move))
 
         # Castling moves
 
@@ -297,44 +298,29 @@ class King(Piece):
 
     def can_castle(self, board):
 
-        if self.in_check(board, [0, 0]) or self.times_moved > 0 or not self.castle:
+        if self.times_moved > 0 or not self.castle or self.in_check(board, [0, 0]):
             return False, False
 
-        l, r = True, True
+        return self.can_castle_with(board, 0), self.can_castle_with(board, 7)
 
-        # check left
-        for i in range(1, 4):
-            if board[self.cell.row][i].chess_piece and board[self.cell.row][i].chess_piece.active:
-                l = False
-        if board[self.cell.row][0].chess_piece:
-            c = board[self.cell.row][0].chess_piece
-            if not (type(c) == Rook and c.times_moved == 0 and c.castle and c.active):
-                l = False
-        else:
-            l = False
-        # check if passing through check
-        moves = [[0, -i] for i in range(1, 3)]
-
-        for move in moves:
-            if self.in_check(board, move):
-                l = False
-
-        # check right
-
-        for i in range(5, 7):
-            if board[self.cell.row][i].chess_piece and board[self.cell.row][i].chess_piece.active:
-                r = False
-        if board[self.cell.row][7].chess_piece:
-            c = board[self.cell.row][7].chess_piece
-            if not (type(c) == Rook and c.times_moved == 0 and c.castle and c.active):
-                r = False
-        else:
-            r = False
+    # Checks castling with the rook on the given column of the king's row: the rook hasn't moved, the squares between
+    # them are empty and the king doesn't pass through check. The king being in check is tested by can_castle.
+    def can_castle_with(self, board, rook_column):
+        row = self.cell.row
+
+        rook = board[row][rook_column].chess_piece
+        if not (type(rook) == Rook and rook.times_moved == 0 and rook.castle and rook.active):
+            return False
+
+        square = row * 8 + self.cell.column
+        for r, c in BETWEEN[square][row * 8 + rook_column]:
+            piece = board[r][c].chess_piece
+            if piece and piece.active:
+                return False
 
-        # check if passing through check
-        moves = [[0, i] for i in range(1, 3)]
-        for move in moves:
-            if self.in_check(board, move):
-                r = False
+        # the two squares the king passes through and lands on
+        for r, c in BETWEEN[square][row * 8 + rook_column][:2]:
+            if self.in_check(board, [0, c - self.cell.column]):
+                return False
 
-        return l, r
+        return True
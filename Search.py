@@ -0,0 +1,234 @@
+import queue
+import threading
+import time
+
+import Bitboard
+import Move
+import MoveOrdering
+
+MATE_SCORE = 100000  # score of giving checkmate now, less one for every ply it takes to get there
+INFINITY = 1000000
+
+# How many nodes are searched between looks at the clock
+CHECK_INTERVAL = 1024
+MAX_PLY = 128
+
+
+class SearchResult:
+
+    def __init__(self, move, score, depth, pv, nodes, seconds):
+        self.move = move  # best move code, None when there are no legal moves
+        self.score = score  # centipawns from the point of view of the side to move
+        self.depth = depth  # deepest iteration that finished
+        self.pv = pv  # principal variation as move codes, starting with move
+        self.nodes = nodes
+        self.seconds = seconds
+
+    def is_mate(self):
+        return abs(self.score) > MATE_SCORE - 1000
+
+
+# Negamax alpha-beta search over a Bitboard.Position with iterative deepening. The position is searched in place with
+# make_move and unmake_move and is back to where it started when run returns. Moves are tried in the order given by
+# a MoveOrdering.MoveOrderer, whose hash moves carry the best move of each position from one depth to the next.
+class Search:
+
+    def __init__(self, position):
+        self.position = position
+        self.orderer = MoveOrdering.MoveOrderer(MAX_PLY)
+        self.nodes = 0
+        self.stopped = False
+
+        self.max_nodes = None
+        self.deadline = None
+        self.depth = 0  # depth of the current iteration
+        self.pv_table = []
+        self.cooperative = False  # gives other threads a turn every CHECK_INTERVAL nodes
+
+    # Asks a running search to stop. It returns the result of the last depth it finished.
+    def stop(self):
+        self.stopped = True
+
+    # Searches one depth deeper at a time until max_depth, max_nodes or time_limit (seconds) runs out. With no limit
+    # at all the search stops at depth 4. The first depth always finishes so there is a move to play.
+    # info is called with the SearchResult of each finished depth.
+    def run(self, max_depth=None, max_nodes=None, time_limit=None, info=None):
+
+        if max_depth is None and max_nodes is None and time_limit is None:
+            max_depth = 4
+
+        start = time.perf_counter()
+        self.nodes = 0
+        self.orderer.clear()
+        self.max_nodes = max_nodes
+        self.deadline = start + time_limit if time_limit is not None else None
+
+        result = SearchResult(None, 0, 0, [], 0, 0)
+        depth = 0
+        while max_depth is None or depth < max_depth:
+            depth += 1
+            self.depth = depth
+            self.pv_table = [[] for _ in range(MAX_PLY + 1)]
+
+            score = self.negamax(depth, 0, -INFINITY, INFINITY)
+            if self.stopped and depth > 1:
+                break
+
+            pv = self.pv_table[0]
+            result = SearchResult(pv[0] if pv else None, score, depth, pv, self.nodes,
+                                  time.perf_counter() - start)
+            if info:
+                info(result)
+
+            # nothing more to find once there is no move or a forced mate has been seen
+            if not pv or abs(score) > MATE_SCORE - 1000 or self.stopped:
+                break
+
+        result.nodes = self.nodes
+        result.seconds = time.perf_counter() - start
+        # cleared here rather than at the start, so a stop() that comes before the search starts is not lost
+        self.stopped = False
+        return result
+
+    def check_limits(self):
+        if self.cooperative:
+            time.sleep(0)
+        if self.max_nodes is not None and self.nodes >= self.max_nodes:
+            self.stopped = True
+        elif self.deadline is not None and time.perf_counter() >= self.deadline:
+            self.stopped = True
+
+    # Score of the position for the side to move
+    def negamax(self, depth, ply, alpha, beta):
+        position = self.position
+        orderer = self.orderer
+
+        self.nodes += 1
+        if self.nodes % CHECK_INTERVAL == 0:
+            self.check_limits()
+
+        self.pv_table[ply] = []
+        if ply and position.is_draw():
+            return 0
+
+        if depth == 0 or ply >= MAX_PLY - 1:
+            return self.quiescence(ply, alpha, beta)
+
+        key = position.hash
+        best_move = None
+        searched = 0
+
+        for move in orderer.staged_moves(position, ply, orderer.hash_moves.get(key)):
+            searched += 1
+            position.make_move(move)
+            score = -self.negamax(depth - 1, ply + 1, -beta, -alpha)
+            position.unmake_move()
+
+            if self.stopped and self.depth > 1:
+                return 0
+
+            if score > alpha:
+                alpha = score
+                best_move = move
+                self.pv_table[ply] = [move] + self.pv_table[ply + 1]
+                if alpha >= beta:
+                    if not move >> 12 & (Move.CAPTURE | Move.PROMOTION):
+                        orderer.add_cutoff(move, ply, depth)
+                    break
+
+        if not searched:
+            return -MATE_SCORE + ply if position.in_check() else 0
+
+        if best_move is not None:
+            orderer.hash_moves.put(key, best_move)
+
+        return alpha
+
+    # Searches captures and promotions until the position is quiet, so the score at the end of the main search isn't
+    # taken in the middle of an exchange. The side to move can stand pat on the static evaluation instead of
+    # capturing, except in check where every evasion is searched. Captures that static exchange evaluation says lose
+    # material are skipped.
+    def quiescence(self, ply, alpha, beta):
+        position = self.position
+
+        self.nodes += 1
+        if self.nodes % CHECK_INTERVAL == 0:
+            self.check_limits()
+
+        self.pv_table[ply] = []
+        in_check = position.in_check()
+
+        if in_check:
+            moves = position.legal_moves()
+            if not moves:
+                return -MATE_SCORE + ply
+        else:
+            score = position.evaluation() if position.side == Bitboard.WHITE else -position.evaluation()
+            if score >= beta or ply >= MAX_PLY - 1:
+                return score
+            if score > alpha:
+                alpha = score
+            moves = position.legal_moves(stage=Bitboard.GENERATE_CAPTURES)
+
+        for move in self.orderer.order(position, moves, ply):
+            if not in_check and not move >> 12 & Move.PROMOTION and position.see(move) < 0:
+                continue
+
+            position.make_move(move)
+            score = -self.quiescence(ply + 1, -beta, -alpha)
+            position.unmake_move()
+
+            if self.stopped and self.depth > 1:
+                return 0
+
+            if score > alpha:
+                alpha = score
+                self.pv_table[ply] = [move] + self.pv_table[ply + 1]
+                if alpha >= beta:
+                    break
+
+        return alpha
+
+
+# Searches the position of a ChessBoard, which must have been created with bitboards=True.
+# Returns a SearchResult whose move can be turned into a Move with chess_board.build_move.
+def search(chess_board, max_depth=None, max_nodes=None, time_limit=None, info=None):
+    return Search(chess_board.position).run(max_depth, max_nodes, time_limit, info)
+
+
+# Runs searches on a thread so the caller, like the pygame loop, keeps going while the engine thinks. Each search
+# works on its own copy of the position and hands its result back through a queue.
+class BackgroundSearch:
+
+    def __init__(self):
+        self.results = queue.Queue()
+        self.search = None  # search whose result is wanted, None when not thinking
+
+    def start(self, position, max_depth=None, max_nodes=None, time_limit=None):
+        self.cancel()
+        self.search = Search(position.copy())
+        self.search.cooperative = True
+        threading.Thread(target=self.run, args=(self.search, max_depth, max_nodes, time_limit), daemon=True).start()
+
+    def run(self, search, max_depth, max_nodes, time_limit):
+        self.results.put((search, search.run(max_depth, max_nodes, time_limit)))
+
+    def is_thinking(self):
+        return self.search is not None
+
+    # Stops the current search and drops its result
+    def cancel(self):
+        if self.search:
+            self.search.stop()
+            self.search = None
+
+    # SearchResult of the current search once it has finished, otherwise None
+    def get_result(self):
+        while True:
+            try:
+                search, result = self.results.get_nowait()
+            except queue.Empty:
+                return None
+            if search is self.search:
+                self.search = None
+                return result
@@ -1,9 +1,13 @@
+import argparse
 import sys
 import pygame
 import ChessBoard
+import OpeningBook
 import Pieces
+import Search
 
 FPS = 60
+ENGINE_POLL_INTERVAL = 50  # milliseconds between looks for the engine's move while waiting for events
 
 # Colors
 BLACK = (0, 0, 0)
@@ -34,81 +38,194 @@ screen_rect = pygame.Rect(
     [SCREEN_BORDER, SCREEN_BORDER, SCREEN_WIDTH - (SCREEN_BORDER * 2), SCREEN_HEIGHT - (SCREEN_BORDER * 2)])
 pygame.draw.rect(screen_display, BLACK, screen_rect)
 
-white_pawn_image = pygame.image.load("pieces_images/Chess_plt60.png")
+PIECE_TYPES = [Pieces.Queen, Pieces.King, Pieces.Rook, Pieces.Knight, Pieces.Bishop, Pieces.Pawn]
+PIECE_LETTERS = {Pieces.Pawn: 'p', Pieces.Rook: 'r', Pieces.Knight: 'n', Pieces.Bishop: 'b', Pieces.Queen: 'q',
+                 Pieces.King: 'k'}
+ATLAS_PATH = "pieces_images/ChessPiecesArray.png"
+SPRITE_SIZE = 60
+
+
+# Piece images keyed by (piece class, is_white), converted to the display's pixel format so blitting them doesn't
+# convert every frame. With atlas=True they are cut from ChessPiecesArray.png, which has the pieces in PIECE_TYPES
+# order with black on the top row, instead of loaded from the twelve separate files.
+def load_piece_images(atlas=False):
+    images = {}
+    if atlas:
+        sheet = pygame.image.load(ATLAS_PATH).convert_alpha()
+        for column, piece_type in enumerate(PIECE_TYPES):
+            for row, is_white in enumerate((False, True)):
+                images[piece_type, is_white] = sheet.subsurface(
+                    (column * SPRITE_SIZE, row * SPRITE_SIZE, SPRITE_SIZE, SPRITE_SIZE)).copy()
+    else:
+        for piece_type, letter in PIECE_LETTERS.items():
+            for is_white, shade in ((True, 'l'), (False, 'd')):
+                path = f"pieces_images/Chess_{letter}{shade}t{SPRITE_SIZE}.png"
+                images[piece_type, is_white] = pygame.image.load(path).convert_alpha()
+    return images
+
+
+piece_images = load_piece_images()
+
+# Fonts, rendered text and pop up boxes, made the first time they are needed
+fonts = {}
+text_surfaces = {}
+message_boxes = {}
+
+
+def get_font(size):
+    if size not in fonts:
+        fonts[size] = pygame.font.SysFont('Sans', size, True, False)
+    return fonts[size]
+
+
+def render_text(text, size):
+    key = (text, size)
+    if key not in text_surfaces:
+        text_surfaces[key] = get_font(size).render(text, True, WHITE)
+    return text_surfaces[key]
+
+
+# White text in a black box with a teal border
+def get_message_box(text, size):
+    key = (text, size)
+    if key not in message_boxes:
+        text_surface = render_text(text, size)
+        rect = text_surface.get_rect()
+        spacing = 20
 
-black_pawn_image = pygame.image.load("pieces_images/Chess_pdt60.png")
+        box = pygame.Surface((rect.w + spacing * 2, rect.h + spacing * 2)).convert()
+        box.fill(TEAL)
+        pygame.draw.rect(box, BLACK, [spacing - 10, spacing - 10, rect.w + 20, rect.h + 20])
+        box.blit(text_surface, (spacing, spacing))
+        message_boxes[key] = box
+    return message_boxes[key]
 
-white_rook_image = pygame.image.load("pieces_images/Chess_rlt60.png")
-black_rook_image = pygame.image.load("pieces_images/Chess_rdt60.png")
 
-white_knight_image = pygame.image.load("pieces_images/Chess_nlt60.png")
-black_knight_image = pygame.image.load("pieces_images/Chess_ndt60.png")
+# Blits a message box in the middle of the screen and returns its rect
+def draw_message_box(surface, text, size):
+    box = get_message_box(text, size)
+    return surface.blit(box, box.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2)))
 
-white_bishop_image = pygame.image.load("pieces_images/Chess_blt60.png")
-black_bishop_image = pygame.image.load("pieces_images/Chess_bdt60.png")
 
-white_queen_image = pygame.image.load("pieces_images/Chess_qlt60.png")
-black_queen_image = pygame.image.load("pieces_images/Chess_qdt60.png")
+BOARD_OFFSET = DIVIDER_THICKNESS + SCREEN_BORDER + LINE_THICKNESS  # screen x and y of the first cell
+CELL_PITCH = SQUARE_SIDE_LENGTH + LINE_THICKNESS  # distance from one cell to the next
 
-white_king_image = pygame.image.load("pieces_images/Chess_klt60.png")
-black_king_image = pygame.image.load("pieces_images/Chess_kdt60.png")
 
+# Screen rect of each board cell, indexed by row and column. When flipped, black's side is at the bottom.
+def create_cell_rects(flipped=False):
+    rects = [[] for _ in range(ROWS)]
 
-def draw_chess_board(chess_board):
     for row in range(ROWS):
+        screen_row = ROWS - 1 - row if flipped else row
         for column in range(COLUMNS):
-            pygame.draw.rect(screen_display, chess_board[row][column].color,
-                             chess_board[row][column].rect
-                             )
+            screen_column = COLUMNS - 1 - column if flipped else column
+            rects[row].append(pygame.Rect(BOARD_OFFSET + screen_column * CELL_PITCH,
+                                          BOARD_OFFSET + screen_row * CELL_PITCH, SQUARE_SIDE_LENGTH,
+                                          SQUARE_SIDE_LENGTH))
+
+    return rects
+
+
+board_flipped = False
+cell_rects = create_cell_rects()
+
+
+# (row, column) of the cell at a screen point, or None off the board and on the lines between cells. Worked out from
+# the board geometry rather than by testing each cell's rect.
+def get_cell_position(x, y, flipped=False):
+    x -= BOARD_OFFSET
+    y -= BOARD_OFFSET
+    if x < 0 or y < 0 or x % CELL_PITCH >= SQUARE_SIDE_LENGTH or y % CELL_PITCH >= SQUARE_SIDE_LENGTH:
+        return None
+
+    row, column = y // CELL_PITCH, x // CELL_PITCH
+    if row >= ROWS or column >= COLUMNS:
+        return None
+    if flipped:
+        return ROWS - 1 - row, COLUMNS - 1 - column
+    return row, column
+
+
+# (row, column) of the cell under the mouse, or None
+def get_hovered_position():
+    return get_cell_position(*pygame.mouse.get_pos(), board_flipped)
 
 
 def get_piece_image(piece):
-    if type(piece) == Pieces.Pawn:
-        if piece.is_white:
-            return white_pawn_image
-        else:
-            return black_pawn_image
-    elif type(piece) == Pieces.Rook:
-        if piece.is_white:
-            return white_rook_image
-        else:
-            return black_rook_image
-    elif type(piece) == Pieces.Knight:
-        if piece.is_white:
-            return white_knight_image
-        else:
-            return black_knight_image
-    elif type(piece) == Pieces.Bishop:
-        if piece.is_white:
-            return white_bishop_image
-        else:
-            return black_bishop_image
-    elif type(piece) == Pieces.Queen:
-        if piece.is_white:
-            return white_queen_image
-        else:
-            return black_queen_image
-    elif type(piece) == Pieces.King:
-        if piece.is_white:
-            return white_king_image
-        else:
-            return black_king_image
-
-
-def draw_pieces(pieces, selected_piece):
-    for piece in pieces:
-        if piece.active:
-            board_cell = piece.cell
-            img = get_piece_image(piece)
-            center_x = (board_cell.square_length - img.get_width()) // 2
-            center_y = (board_cell.square_length - img.get_height()) // 2
-            screen_display.blit(img, (board_cell.x + center_x, board_cell.y + center_y))
-
-        if selected_piece and selected_piece.active:
-            if selected_piece == piece:
-                outline_rect = pygame.Rect(piece.cell.x, piece.cell.y, piece.cell.square_length,
-                                           piece.cell.square_length)
-                pygame.draw.rect(screen_display, RED, outline_rect, 5)
+    return piece_images[type(piece), piece.is_white]
+
+
+# Draws one cell with its color, its piece centred in it and a red border when the piece is selected
+def draw_square(surface, row, column, color, image, selected):
+    cell_rect = cell_rects[row][column]
+    pygame.draw.rect(surface, color, cell_rect)
+
+    if image:
+        center_x = (cell_rect.w - image.get_width()) // 2
+        center_y = (cell_rect.h - image.get_height()) // 2
+        surface.blit(image, (cell_rect.x + center_x, cell_rect.y + center_y))
+
+    if selected:
+        pygame.draw.rect(surface, RED, cell_rect, 5)
+
+
+# Draws the pop ups that go over the board and returns the rects they cover
+def draw_overlays(surface, pop_up, promotion_pop_up, game_state, thinking):
+    rects = []
+    if pop_up:
+        rects.append(draw_text_box(surface, game_state))
+    elif promotion_pop_up:
+        rects.append(draw_promotion_box(surface))
+
+    if thinking:
+        rects.append(draw_thinking_indicator(surface))
+    return [rect for rect in rects if rect]
+
+
+# Keeps what each square showed on the last frame and only draws the squares whose color, piece or selection changed
+# since then, along with the pop ups over them. draw returns the changed screen rects to pass to
+# pygame.display.update, so a frame where nothing changed costs 64 comparisons and no drawing.
+class BoardRenderer:
+
+    def __init__(self, surface):
+        self.surface = surface
+        self.drawn = [[None] * COLUMNS for _ in range(ROWS)]  # (color, image, selected) of each square
+        self.overlay = None  # arguments of draw_overlays on the frame the pop ups were last drawn
+        self.overlay_rects = []
+
+    # Draws everything again on the next frame, for when the window has been covered
+    def invalidate(self):
+        self.drawn = [[None] * COLUMNS for _ in range(ROWS)]
+        self.overlay = None
+
+    def draw(self, board, selected_piece, overlay):
+        if overlay != self.overlay:
+            # the squares under pop ups that are going away are drawn again
+            for rect in self.overlay_rects:
+                for row in range(ROWS):
+                    for column in range(COLUMNS):
+                        if cell_rects[row][column].colliderect(rect):
+                            self.drawn[row][column] = None
+
+        dirty = []
+        for row in range(ROWS):
+            drawn_row = self.drawn[row]
+            for column in range(COLUMNS):
+                cell = board[row][column]
+                piece = cell.chess_piece
+                state = (cell.color, get_piece_image(piece) if piece else None,
+                         piece is not None and piece is selected_piece)
+                if state != drawn_row[column]:
+                    draw_square(self.surface, row, column, *state)
+                    drawn_row[column] = state
+                    dirty.append(cell_rects[row][column])
+
+        if overlay != self.overlay or any(rect.collidelist(self.overlay_rects) != -1 for rect in dirty):
+            self.overlay_rects = draw_overlays(self.surface, *overlay)
+            self.overlay = overlay
+            dirty.extend(self.overlay_rects)
+
+        return dirty
 
 
 def get_game_state_message(game_state):
@@ -122,97 +239,122 @@ def get_game_state_message(game_state):
         message = "Checkmate. White wins."
     elif game_state == ChessBoard.GameState.BLACK_WIN:
         message = "Checkmate. Black wins."
+    elif game_state == ChessBoard.GameState.FIFTY_MOVE_DRAW:
+        message = "Fifty move rule. It's a draw."
+    elif game_state == ChessBoard.GameState.REPETITION_DRAW:
+        message = "Threefold repetition. It's a draw."
+    elif game_state == ChessBoard.GameState.INSUFFICIENT_MATERIAL:
+        message = "Insufficient material. It's a draw."
     else:
         message = None
     return message
 
 
 def draw_promotion_box(surface):
-    font = pygame.font.SysFont('Sans', 20, True, False)
     text = "Press q for Queen | " \
            "Press n for Knight | " \
            "Press r for Rook | " \
            "Press b for Bishop "
-    text_surface = font.render(text, True, WHITE)
-    rect = text_surface.get_rect()
-    w = rect.w // 2
-    h = rect.h // 2
-    x = SCREEN_WIDTH // 2 - w
-    y = SCREEN_HEIGHT // 2 - h
-
-    spacing = 20
-
-    # border
-    pygame.draw.rect(surface, TEAL, [x - spacing, y - spacing, rect.w + spacing * 2, rect.h + spacing * 2])
-
-    pygame.draw.rect(surface, BLACK, [x - 10, y - 10, rect.w + 20, rect.h + 20])
-    surface.blit(text_surface, (x, y))
+    return draw_message_box(surface, text, 20)
 
 
 def draw_text_box(surface, game_state):
-    font = pygame.font.SysFont('Sans', 50, True, False)
     text = get_game_state_message(game_state)
 
     if text:
-        text_surface = font.render(text, True, WHITE)
+        return draw_message_box(surface, text, 50)
+    return None
 
-        rect = text_surface.get_rect()
-        w = rect.w // 2
-        h = rect.h // 2
-        x = SCREEN_WIDTH // 2 - w
-        y = SCREEN_HEIGHT // 2 - h
 
-        spacing = 20
+# Events to handle on this pass of the loop. When polling, whatever is queued is returned straight away and the loop
+# runs at FPS. Otherwise the loop sleeps in pygame.event.wait until input comes, or until timeout milliseconds have
+# passed when there is an engine search to look in on (None waits as long as it takes, 0 doesn't wait).
+def get_events(poll, timeout=None):
+    if poll:
+        clock.tick(FPS)
+        return pygame.event.get()
 
-        # border
-        pygame.draw.rect(surface, TEAL, [x - spacing, y - spacing, rect.w + spacing * 2, rect.h + spacing * 2])
+    if timeout == 0:
+        return pygame.event.get()
 
-        pygame.draw.rect(surface, BLACK, [x - 10, y - 10, rect.w + 20, rect.h + 20])
-        surface.blit(text_surface, (x, y))
+    event = pygame.event.wait(timeout) if timeout else pygame.event.wait()
+    events = [] if event.type == pygame.NOEVENT else [event]
+    return events + pygame.event.get()
 
 
-def get_promotion_selection():
-    while True:
-        for event in pygame.event.get():
-            if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_q:
-                    promotion_selection = 'q'
-                elif event.key == pygame.K_n:
-                    promotion_selection = 'n'
-                elif event.key == pygame.K_r:
-                    promotion_selection = 'r'
-                elif event.key == pygame.K_b:
-                    promotion_selection = 'b'
-                else:
-                    promotion_selection = ''
-                print(promotion_selection)
-                if promotion_selection:
-                    return promotion_selection
+def draw_thinking_indicator(surface):
+    text_surface = render_text("Thinking...", 20)
+    rect = text_surface.get_rect()
+    box = pygame.draw.rect(surface, BLACK, [5, 5, rect.w + 10, rect.h + 10])
+    surface.blit(text_surface, (10, 10))
+    return box
+
+
+# Plays the move of a finished engine search on the board
+def play_engine_move(chess_board, result, debug=False):
+    if debug:
+        print(f"Engine: depth {result.depth}, score {result.score}, {result.nodes} nodes in {result.seconds:.2f}s")
+
+    # a search of a position with no legal moves has nothing to play
+    if result.move is None:
+        return None
 
+    move = chess_board.build_move(result.move)
+    chess_board.move_piece(move)
+    return move
+
+
+def is_game_over(game_state):
+    return game_state in [ChessBoard.GameState.STALEMATE, ChessBoard.GameState.WHITE_WIN,
+                          ChessBoard.GameState.BLACK_WIN, ChessBoard.GameState.FIFTY_MOVE_DRAW,
+                          ChessBoard.GameState.REPETITION_DRAW, ChessBoard.GameState.INSUFFICIENT_MATERIAL]
+
+
+# engine_color is 'white' or 'black' to play against the engine, which thinks for think_time seconds a move and
+# plays from the Polyglot opening book at book_path while the position is in it.
+# The loop only wakes up for input and engine moves unless poll is set, which redraws at FPS like before. atlas cuts
+# the piece images from ChessPiecesArray.png. flipped draws the board with black's side at the bottom.
+def main(fen=None, debug=False, engine_color=None, think_time=2.0, book_path=None, poll=False, atlas=False,
+         flipped=False):
+    global piece_images, board_flipped, cell_rects
+    if atlas:
+        piece_images = load_piece_images(atlas=True)
+    board_flipped = flipped
+    cell_rects = create_cell_rects(flipped)
 
-def main(fen=None, debug=False):
     original_fen = fen
     chess_board = ChessBoard.ChessBoard(fen)
+    engine = Search.BackgroundSearch()
+    book = OpeningBook.OpeningBook(book_path) if book_path else None
+    renderer = BoardRenderer(screen_display)
 
     selected_piece = None
     moves = []
     move_stack = []
 
-    pop_up = False
+    # the starting position can already be over, so the engine doesn't search a side with no moves
+    game_state = chess_board.get_state(draws=True)
+    pop_up = is_game_over(game_state)
     promotion_pop_up = False
-    game_state = None
 
     promotion_selection = ''
+    timeout = 0
 
     while True:
 
-        chess_board.check_if_cells_hovered()
+        events = get_events(poll, timeout)
+        # the mouse is read once a pass and used for the hover color and any clicks
+        hovered_position = get_hovered_position()
+        chess_board.check_if_cells_hovered(hovered_position)
 
-        for event in pygame.event.get():
+        for event in events:
             if event.type == pygame.QUIT:
                 pygame.quit()
                 sys.exit()
 
+            if event.type == pygame.VIDEOEXPOSE:
+                renderer.invalidate()
+
             if event.type == pygame.MOUSEBUTTONDOWN:
                 mouse_button = event.button
 
@@ -221,8 +363,7 @@ def main(fen=None, debug=False):
                     pop_up = False
                     promotion_pop_up = False
 
-                    if game_state in [ChessBoard.GameState.STALEMATE, ChessBoard.GameState.WHITE_WIN,
-                                      ChessBoard.GameState.BLACK_WIN]:
+                    if is_game_over(game_state):
                         chess_board = ChessBoard.ChessBoard(original_fen)
 
                         selected_piece = None
@@ -230,14 +371,14 @@ def main(fen=None, debug=False):
                         moves = []
                         move_stack = []
 
-                        pop_up = False  #
                         promotion_pop_up = False  #
 
-                        game_state = None
+                        game_state = chess_board.get_state(draws=True)
+                        pop_up = is_game_over(game_state)
 
                 elif mouse_button == 1 and not selected_piece and not pop_up:
 
-                    selected_piece = chess_board.get_piece_clicked()
+                    selected_piece = chess_board.get_piece_clicked(hovered_position)
 
                     if selected_piece:
 
@@ -265,9 +406,9 @@ def main(fen=None, debug=False):
                 elif mouse_button == 1 and selected_piece and not pop_up:
 
                     if selected_piece.is_white and chess_board.white_turn or not selected_piece.is_white and not chess_board.white_turn:
-                        cell = chess_board.get_clicked_cell()
+                        cell = chess_board.get_clicked_cell(hovered_position)
 
-                        if moves:
+                        if moves and cell:
                             for move in moves:
 
                                 if move.new_pos == cell.get_grid_position():
@@ -281,11 +422,11 @@ def main(fen=None, debug=False):
 
                                         # chess_board.white_turn = not chess_board.white_turn
                                         chess_board.turn += 1
-                                        game_state = chess_board.get_state()
+                                        game_state = chess_board.get_state(draws=True)
                                         promotion_selection = None
                                     break
 
-                        elif chess_board.get_state() == ChessBoard.GameState.STALEMATE:
+                        elif chess_board.get_state(draws=True) == ChessBoard.GameState.STALEMATE:
                             pop_up = True
 
                     selected_piece = None
@@ -295,7 +436,7 @@ def main(fen=None, debug=False):
 
                 elif mouse_button == 3 and not selected_piece and not pop_up:
                     '''
-                    remove_piece = chess_board.get_piece_clicked()
+                    remove_piece = chess_board.get_piece_clicked(hovered_position)
                     if remove_piece:
                         remove_piece.cell.chess_piece = None
                         remove_piece.active = False
@@ -324,26 +465,31 @@ def main(fen=None, debug=False):
 
                 elif event.key == pygame.K_c:  # Reset
 
+                    engine.cancel()
                     chess_board = ChessBoard.ChessBoard(original_fen)
 
                     selected_piece = None
 
                     moves = []
                     move_stack = []
-                    game_state = None
+                    game_state = chess_board.get_state(draws=True)
 
-                    pop_up = False
+                    pop_up = is_game_over(game_state)
                     promotion_pop_up = False
 
                     promotion_selection = None
 
                 elif event.key == pygame.K_d:
-                    if move_stack:
+                    engine.cancel()
+                    # against the engine, go back to the last position where it was the player's turn
+                    while move_stack:
                         last_move = move_stack.pop()
                         chess_board.undo_move(last_move)
 
                         chess_board.turn -= 1
-                        game_state = chess_board.get_state()
+                        if not engine_color or chess_board.white_turn != (engine_color == 'white'):
+                            break
+                    game_state = chess_board.get_state(draws=True)
 
         if selected_piece:
             if selected_piece.is_white == chess_board.white_turn:
@@ -353,20 +499,47 @@ def main(fen=None, debug=False):
 
         chess_board.color_king_check(game_state)
 
-        draw_chess_board(chess_board.board)
-        draw_pieces(chess_board.chess_pieces, selected_piece)
-
-        if pop_up:
-
-            draw_text_box(screen_display, game_state)
-        elif promotion_pop_up:
-
-            draw_promotion_box(screen_display)
+        dirty_rects = renderer.draw(chess_board.board, selected_piece if selected_piece and selected_piece.active
+                                    else None, (pop_up, promotion_pop_up, game_state, engine.is_thinking()))
+        if dirty_rects:
+            pygame.display.update(dirty_rects)
+
+        timeout = None
+
+        # The engine searches on another thread and its move is played once the search finishes
+        if engine_color and chess_board.white_turn == (engine_color == 'white') and not is_game_over(game_state):
+            engine_move = None
+            result = engine.get_result()
+            if result:
+                engine_move = play_engine_move(chess_board, result, debug)
+            elif not engine.is_thinking():
+                engine_move = book.choose(chess_board) if book else None
+                if engine_move:
+                    chess_board.move_piece(engine_move)
+                else:
+                    engine.start(chess_board.position, time_limit=think_time)
 
-        pygame.display.update()
-        clock.tick(FPS)
+            if engine_move:
+                move_stack.append(engine_move)
+                chess_board.turn += 1
+                game_state = chess_board.get_state(draws=True)
+                if game_state:
+                    pop_up = True
+                timeout = 0  # draw the move straight away
+            elif engine.is_thinking():
+                timeout = ENGINE_POLL_INTERVAL
 
 
 if __name__ == '__main__':
     #fen = "r5k1/1P6/8/8/8/8/1p6/2R4K"
-    main(debug=True)
+    parser = argparse.ArgumentParser(description="Chess")
+    parser.add_argument("fen", nargs="?")
+    parser.add_argument("-e", "--engine", choices=["white", "black"], help="color the engine plays")
+    parser.add_argument("-t", "--time", type=float, default=2.0, help="seconds the engine thinks for each move")
+    parser.add_argument("-b", "--book", help="Polyglot .bin opening book for the engine")
+    parser.add_argument("--poll", action="store_true", help=f"redraw {FPS} times a second instead of waiting for input")
+    parser.add_argument("--atlas", action="store_true", help="use the piece images in " + ATLAS_PATH)
+    parser.add_argument("-f", "--flip", action="store_true", help="show the board from black's side")
+    args = parser.parse_args()
+    main(args.fen, debug=True, engine_color=args.engine, think_time=args.time, book_path=args.book, poll=args.poll,
+         atlas=args.atlas, flipped=args.flip)
@@ -1,4 +1,21 @@
+import Benchmark
+import Bitboard
 import ChessBoard
+import Evaluation
+import Move
+import MoveOrdering
+import OpeningBook
+import Perft
+import Pieces
+import PerftSuite
+import Pgn
+import Search
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import time
 import unittest
 
 
@@ -20,7 +37,8 @@ class Test(unittest.TestCase):
         # Position 3
         self.ChessBoard_3 = ChessBoard.ChessBoard("8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - ")
         # Position 4
-        self.ChessBoard_4 = ChessBoard.ChessBoard("r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1")
+        self.ChessBoard_4_fen = "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1"
+        self.ChessBoard_4 = ChessBoard.ChessBoard(self.ChessBoard_4_fen)
         # Position 4 mirrored
         self.ChessBoard_4b = ChessBoard.ChessBoard("r2q1rk1/pP1p2pp/Q4n2/bbp1p3/Np6/1B3NBn/pPPP1PPP/R3K2R b KQ - 0 1 ")
         # Position 5
@@ -30,85 +48,471 @@ class Test(unittest.TestCase):
 
     def test_perft_results(self):
 
-        res_1 = move_number_test(self.ChessBoard_1, 3)
+        res_1 = Perft.move_number_test(self.ChessBoard_1, 3)
         self.assertEqual(res_1, (8902, 34, 0, 0, 0, 12, 0))
 
-        res_2 = move_number_test(self.ChessBoard_2, 3)
+        res_2 = Perft.move_number_test(self.ChessBoard_2, 3)
         self.assertEqual(res_2, (97862, 17102+351+8, 45+1, 3162+91+2, 0, 993+3, 1))
 
-        res_3 = move_number_test(self.ChessBoard_3, 4)
+        res_3 = Perft.move_number_test(self.ChessBoard_3, 4)
         self.assertEqual(res_3, (43238, 3348+209+14+1, 123+2, 0, 0, 1680+267+10+2, 17))
 
-        res_4 = move_number_test(self.ChessBoard_4, 3)
+        res_4 = Perft.move_number_test(self.ChessBoard_4, 3)
         self.assertEqual(res_4, (9467, 1021+87, 4, 0+6, 120+48, 38+10, 22))
 
-        res_4b = move_number_test(self.ChessBoard_4b, 3)
+        res_4b = Perft.move_number_test(self.ChessBoard_4b, 3)
         self.assertEqual(res_4b, (9467, 1021 + 87, 4, 0 + 6, 120 + 48, 38 + 10, 22))
 
-        res_5 = move_number_test(self.ChessBoard_5, 3)
+        res_5 = Perft.move_number_test(self.ChessBoard_5, 3)
         self.assertEqual(res_5[0], 62379)
 
-        res_6 = move_number_test(self.ChessBoard_6, 2)
+        res_6 = Perft.move_number_test(self.ChessBoard_6, 2)
         self.assertEqual(res_6[0], 2079)
 
-def move_number_test(chess_board, depth):
+    def test_bitboard_perft_results(self):
 
-    if depth == 0:
-
-        return 1, 0, 0, 0, 0, 0, 0
-
-    n = 0
-    checks = 0
-    removed_pieces = 0
-    castles = 0
-    promotions = 0
-    en_passant = 0
-    checkmates = 0
-    all_moves = []
-
-    for piece in chess_board.chess_pieces:
-
-        if piece.is_white == chess_board.white_turn and piece.active:
-
-            valid_moves = chess_board.get_valid_moves(piece) # appending during promotion moves wont give accurate results
-
-            all_moves.extend(valid_moves)
-
-    for m in all_moves:
-
-        chess_board.move_piece(m)
-        state = chess_board.get_state()
-        if state in [ChessBoard.GameState.BLACK_CHECK, ChessBoard.GameState.WHITE_CHECK]:
-            checks += 1
-        elif state in [ChessBoard.GameState.WHITE_WIN, ChessBoard.GameState.BLACK_WIN]:
-            checks += 1
-            checkmates += 1
-
-        if m.removed_piece:
+        res_1 = Perft.perft(self.ChessBoard_1.position, 3)
+        self.assertEqual(res_1, (8902, 34, 0, 0, 0, 12, 0))
 
-            removed_pieces += 1
-            if m.en_passant:
+        res_2 = Perft.perft(self.ChessBoard_2.position, 3)
+        self.assertEqual(res_2, (97862, 17102+351+8, 45+1, 3162+91+2, 0, 993+3, 1))
 
-                en_passant += 1
+        res_3 = Perft.perft(self.ChessBoard_3.position, 4)
+        self.assertEqual(res_3, (43238, 3348+209+14+1, 123+2, 0, 0, 1680+267+10+2, 17))
 
-        if m.castling:
-            castles += 1
+        res_4 = Perft.perft(self.ChessBoard_4.position, 3)
+        self.assertEqual(res_4, (9467, 1021+87, 4, 0+6, 120+48, 38+10, 22))
 
-        if m.promoted:
-            promotions += 1
+        res_4b = Perft.perft(self.ChessBoard_4b.position, 3)
+        self.assertEqual(res_4b, (9467, 1021 + 87, 4, 0 + 6, 120 + 48, 38 + 10, 22))
 
-        result = move_number_test(chess_board, depth - 1)
-        n += result[0]
+        res_5 = Perft.perft(self.ChessBoard_5.position, 3)
+        self.assertEqual(res_5[0], 62379)
 
-        removed_pieces += result[1]
-        en_passant += result[2]
-        castles += result[3]
-        promotions += result[4]
-        checks += result[5]
-        checkmates += result[6]
-        chess_board.undo_move(m)
+        res_6 = Perft.perft(self.ChessBoard_6.position, 2)
+        self.assertEqual(res_6[0], 2079)
 
-    return n, removed_pieces, en_passant, castles, promotions, checks, checkmates
+        # a depth of 0 or less is a single leaf
+        for depth in (0, -1):
+            self.assertEqual(Perft.perft(self.ChessBoard_1.position, depth), (1, 0, 0, 0, 0, 0, 0))
+
+    def test_cached_perft_results(self):
+
+        cache = Perft.PerftCache(1 << 16)
+
+        res_1 = Perft.perft(self.ChessBoard_1.position, 4, cache)
+        self.assertEqual(res_1, (197281, 1576+34, 0, 0, 0, 469+12, 8))
+
+        res_3 = Perft.perft(self.ChessBoard_3.position, 5, cache)
+        self.assertEqual(res_3, (674624, 52051+3348+209+14+1, 1165+123+2, 0, 0, 52950+1680+267+10+2, 17))
+        self.assertTrue(cache.hits > 0)
+
+    def test_parallel_perft_results(self):
+
+        fen = "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1"
+        for split_depth in (1, 2):
+            results = Perft.parallel_perft(fen, 3, processes=2, split_depth=split_depth)
+            self.assertEqual(len(results), 6)
+            self.assertEqual(Perft.total_counts(results), (9467, 1021+87, 4, 0+6, 120+48, 38+10, 22))
+
+    def test_perft_suite(self):
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "suite.epd")
+            with open(path, "w") as file:
+                file.write("# perft suite\n"
+                           "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1 ;D1 20 ;D2 400 ;D3 8902\n"
+                           "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1 ;D1 14 ;D2 191 ;D3 2813\n"
+                           "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1 ;D1 6 ;D2 265\n")
+
+            for processes in (1, 2):
+                output = io.StringIO()
+                summary = PerftSuite.run_suite(path, 2, processes, output=output)
+                self.assertEqual((summary.positions, summary.failures, summary.nodes), (3, 1, 895))
+                lines = output.getvalue().splitlines()
+                self.assertTrue(lines[0].startswith("line 4: depth 2 expected 265 nodes, found 264"))
+                self.assertEqual(len(lines), 7)
+
+    def test_pgn_replay(self):
+
+        chess_board = self.ChessBoard_2
+        for san, name in (("O-O-O", "e1c1"), ("Nxd7", "e5d7"), ("gxh3", "g2h3"), ("Qxf6+", "f3f6")):
+            self.assertEqual(Bitboard.move_name(chess_board.position.parse_san(san)), name)
+        for san in ("Ra1", "Nd4", "e8=Q", "Kxe2", "Qf3x"):
+            self.assertRaises(ValueError, chess_board.position.parse_san, san)
+        move = chess_board.parse_san("Bxa6")
+        self.assertEqual((move.piece.name, tuple(move.start_pos), move.new_pos), ("White Bishop", (6, 4), (2, 0)))
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "games.pgn")
+            with open(path, "w") as file:
+                file.write('[Event "Opera game"]\n[White "Morphy"]\n[Black "Duke"]\n\n'
+                           '1. e4 e5 2. Nf3 d6 3. d4 Bg4 {a weak move} 4. dxe5 Bxf3 5. Qxf3 dxe5 6. Bc4 Nf6\n'
+                           '7. Qb3 Qe7 8. Nc3 c6 9. Bg5 b5 (9... Qc7 10. O-O-O) 10. Nxb5 cxb5 11. Bxb5+ Nbd7\n'
+                           '12. O-O-O Rd8 13. Rxd7 Rxd7 14. Rd1 Qe6 15. Bxd7+ Nxd7 16. Qb8+ $1 Nxb8 17. Rd8# 1-0\n\n'
+                           '[White "A"]\n[Black "B"]\n\n1. e4 e5 2. Ke3 ; not a king move\n1/2-1/2\n\n'
+                           '[FEN "8/P7/8/8/8/8/8/k6K w - - 0 1"]\n\n1. a8=Q+ Kb2 2. Qb7+ Ka1 3. Qg2 Kb1 4. Qb2# *\n\n'
+                           '1. e4 e5 2. Nf3 Nc6 3. Bc4 Bc5 4. 0-0 Nf6 5. d3 d6 6. Bg5 Be6 7. Nc3 Qd7 8. a3 0-0-0 *\n')
+
+            games = list(Pgn.read_pgn(path))
+            self.assertEqual([len(game.moves) for game in games], [33, 3, 7, 16])
+            self.assertEqual(games[0].moves[:3], ["e4", "e5", "Nf3"])
+            self.assertEqual((games[3].moves[6], games[3].moves[-1]), ("0-0", "0-0-0"))
+
+            for processes in (1, 2):
+                output = io.StringIO()
+                summary = Pgn.replay_pgn(path, processes, batch_size=1, output=output)
+                self.assertEqual((summary.games, summary.moves, summary.errors), (4, 33 + 2 + 7 + 16, 2))
+                self.assertEqual(sorted(line.split(",")[0] for line in output.getvalue().splitlines()),
+                                 ["game 2 (A - B)", "game 3 (? - ?)"])
+
+    def test_benchmark_regressions(self):
+
+        entry = Benchmark.benchmark("bitboard", "Position 3", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - ", 2)
+        self.assertEqual(entry["nodes"], 191)
+        self.assertEqual(entry["move_allocations_per_node"], 0)
+
+        faster = dict(entry, nodes_per_second=entry["nodes_per_second"] * 2)
+        self.assertEqual(Benchmark.compare([entry], {"results": [entry]}, 0.1, 0), [])
+        self.assertEqual(len(Benchmark.compare([entry], {"results": [faster]}, 0.1, 0)), 1)
+
+        # runs too quick to time reliably are only checked for their node count
+        quick = dict(entry, seconds=Benchmark.MIN_SECONDS / 2)
+        self.assertEqual(Benchmark.compare([quick], {"results": [faster]}, 0.1), [])
+        self.assertEqual(len(Benchmark.compare([dict(entry, nodes=190)], {"results": [entry]}, 0.1)), 1)
+
+    def test_incremental_hash(self):
+
+        chess_board = self.ChessBoard_2
+        start_hash = chess_board.get_hash()
+        moves = []
+        for _ in range(4):
+            piece = [p for p in chess_board.chess_pieces if p.active and p.is_white == chess_board.white_turn
+                     and chess_board.get_valid_moves(p)][-1]
+            move = chess_board.get_valid_moves(piece)[-1]
+            chess_board.move_piece(move)
+            moves.append(move)
+            self.assertEqual(chess_board.get_hash(), chess_board.position.compute_hash())
+
+        for move in reversed(moves):
+            chess_board.undo_move(move)
+        self.assertEqual(chess_board.get_hash(), start_hash)
+
+    def test_incremental_evaluation(self):
+
+        # Position 4 has promotions, castling and captures within a few moves
+        for chess_board in (self.ChessBoard_4, ChessBoard.ChessBoard(self.ChessBoard_4_fen, bitboards=False)):
+            start_score = chess_board.evaluation()
+            moves = []
+            for _ in range(6):
+                pieces = [p for p in chess_board.chess_pieces if p.active and p.is_white == chess_board.white_turn
+                          and chess_board.get_valid_moves(p)]
+                move = chess_board.get_valid_moves(pieces[len(moves) % len(pieces)])[-1]
+                promotions = [m for p in pieces for m in chess_board.get_valid_moves(p) if m.promoted]
+                if promotions:
+                    move = promotions[-1]
+                chess_board.move_piece(move)
+                moves.append(move)
+
+                # only pieces still on the board count
+                mg, eg, phase = Evaluation.score_pieces(
+                    (ChessBoard.piece_index(p), p.cell.row * 8 + p.cell.column) for p in chess_board.chess_pieces
+                    if p.active)
+                self.assertEqual(chess_board.evaluation(), Evaluation.tapered(mg, eg, phase))
+                if chess_board.position:
+                    self.assertEqual(chess_board.position.evaluation(), chess_board.evaluation())
+
+            for move in reversed(moves):
+                chess_board.undo_move(move)
+            self.assertEqual(chess_board.evaluation(), start_score)
+
+    def test_move_cache(self):
+
+        for chess_board in (self.ChessBoard_4, ChessBoard.ChessBoard(self.ChessBoard_4_fen, bitboards=False)):
+            pieces = [p for p in chess_board.chess_pieces if p.active]
+            cached = {id(p): chess_board.get_valid_moves(p) for p in pieces}
+            self.assertTrue(all(chess_board.get_valid_moves(p) is cached[id(p)] for p in pieces))
+
+            move = next(m for p in pieces if p.is_white == chess_board.white_turn
+                        for m in chess_board.get_valid_moves(p))
+            chess_board.move_piece(move)
+            self.assertIsNot(chess_board.get_valid_moves(move.piece), cached[id(move.piece)])
+            chess_board.get_state()
+            chess_board.undo_move(move)
+
+            # the moves of the position before are back after undo
+            self.assertTrue(all(chess_board.get_valid_moves(p) is cached[id(p)] for p in pieces))
+            self.assertEqual(Perft.move_number_test(chess_board, 2), (264, 87, 0, 6, 48, 10, 0))
+
+    def test_game_states(self):
+
+        for bitboards in (True, False):
+            states = [ChessBoard.ChessBoard(fen, bitboards=bitboards).get_state(draws=True) for fen in
+                      ("R6k/8/6K1/8/8/8/8/8 b - - 0 1", "7k/5Q2/6K1/8/8/8/8/8 b - - 0 1",
+                       "7k/8/6K1/8/8/8/8/7R b - - 0 1", "7k/8/5BK1/8/8/8/8/2b5 b - - 0 1")]
+            self.assertEqual(states, [ChessBoard.GameState.WHITE_WIN, ChessBoard.GameState.STALEMATE,
+                                      ChessBoard.GameState.BLACK_CHECK, ChessBoard.GameState.INSUFFICIENT_MATERIAL])
+
+        for bitboards in (True, False):
+            # trailing spaces and a missing move number don't lose the counters that are there
+            chess_board = ChessBoard.ChessBoard("7k/8/6K1/8/8/8/8/7R b - - 100 80 ", bitboards=bitboards)
+            self.assertEqual((chess_board.halfmove, chess_board.fullmove), (100, 80))
+            self.assertEqual(chess_board.to_fen(), "7k/8/6K1/8/8/8/8/7R b - - 100 80")
+            self.assertEqual(chess_board.get_state(draws=True), ChessBoard.GameState.FIFTY_MOVE_DRAW)
+            self.assertEqual(chess_board.get_state(), ChessBoard.GameState.BLACK_CHECK)
+            self.assertEqual(ChessBoard.ChessBoard("7k/8/6K1/8/8/8/8/7R b - - 100", bitboards=bitboards).get_state(
+                draws=True), ChessBoard.GameState.FIFTY_MOVE_DRAW)
+
+        # knights out and back twice repeats the starting position a third time
+        chess_board = self.ChessBoard_1
+        for _ in range(2):
+            for start, end in (((7, 6), (5, 5)), ((0, 6), (2, 5)), ((5, 5), (7, 6)), ((2, 5), (0, 6))):
+                self.assertNotEqual(chess_board.get_state(draws=True), ChessBoard.GameState.REPETITION_DRAW)
+                piece = chess_board.board[start[0]][start[1]].chess_piece
+                chess_board.move_piece(next(m for m in chess_board.get_valid_moves(piece) if m.new_pos == end))
+        self.assertEqual(chess_board.get_state(draws=True), ChessBoard.GameState.REPETITION_DRAW)
+        self.assertTrue(chess_board.position.is_draw())
+        self.assertFalse(chess_board.position.is_repetition(4))
+
+        # a check that leaves only a king and bishop is still counted as a check by perft
+        fen = "7k/8/8/8/8/8/8/K5B1 w - - 0 1"
+        for bitboards in (True, False):
+            self.assertEqual(Perft.move_number_test(ChessBoard.ChessBoard(fen, bitboards=bitboards), 2),
+                             Perft.perft(Bitboard.Position(fen), 2))
+
+    def test_fen_and_clone(self):
+
+        # the en passant square of the last FEN is honored without bitboards too
+        for fen in (self.ChessBoard_4_fen, "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+                    "rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 3"):
+            for bitboards in (True, False):
+                chess_board = ChessBoard.ChessBoard(fen, bitboards=bitboards)
+                self.assertEqual(chess_board.to_fen(), fen)
+                self.assertEqual(Perft.move_number_test(chess_board, 2)[0], Perft.perft(Bitboard.Position(fen), 2)[0])
+
+        # 1. e4 d5 2. exd5 c5, leaving an en passant capture on c6
+        fen = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+        boards = [ChessBoard.ChessBoard(fen), ChessBoard.ChessBoard(fen, bitboards=False)]
+        for start, end in (((6, 4), (4, 4)), ((1, 3), (3, 3)), ((4, 4), (3, 3)), ((1, 2), (3, 2))):
+            for chess_board in boards:
+                piece = chess_board.board[start[0]][start[1]].chess_piece
+                chess_board.move_piece(next(m for m in chess_board.get_valid_moves(piece) if m.new_pos == end))
+            self.assertEqual(boards[0].to_fen(), boards[1].to_fen())
+        self.assertEqual(boards[0].to_fen(), "rnbqkbnr/pp2pppp/8/2pP4/8/8/PPPP1PPP/RNBQKBNR w KQkq c6 0 3")
+
+        clone = boards[0].clone()
+        self.assertEqual((clone.to_fen(), clone.get_hash()), (boards[0].to_fen(), boards[0].get_hash()))
+        self.assertEqual(Perft.move_number_test(clone, 2), Perft.move_number_test(boards[1], 2))
+        clone.move_piece(clone.get_valid_moves(clone.black_king)[0])
+        self.assertNotEqual(clone.to_fen(), boards[0].to_fen())
+        self.assertEqual(boards[0].get_hash(), boards[0].position.compute_hash())
+
+        # the clone has its own cells and pieces, which keep how often they moved
+        for chess_board in boards:
+            clone = chess_board.clone()
+            self.assertEqual([p.times_moved for p in clone.chess_pieces],
+                             [p.times_moved for p in chess_board.chess_pieces])
+            self.assertFalse({id(c) for row in clone.board for c in row} &
+                             {id(c) for row in chess_board.board for c in row})
+            self.assertTrue(all(p.cell.chess_piece is p for p in clone.chess_pieces if p.active))
+
+    def test_search(self):
+
+        # a back rank mate in one, and a two rook mate in two
+        for fen, depth, plies in (("6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1", 2, 1),
+                                  ("k7/7p/8/8/8/8/8/1R1R2K1 w - - 0 1", 4, 3)):
+            chess_board = ChessBoard.ChessBoard(fen)
+            start_hash = chess_board.get_hash()
+            result = Search.search(chess_board, max_depth=depth)
+            self.assertEqual(result.score, Search.MATE_SCORE - plies)
+            self.assertEqual(len(result.pv), plies)
+            self.assertEqual(chess_board.get_hash(), start_hash)
+
+        # a node limit stops the search but still gives a move from a finished depth
+        result = Search.search(self.ChessBoard_2, max_nodes=2000)
+        self.assertIn(result.move, self.ChessBoard_2.position.legal_moves())
+        self.assertLess(result.nodes, 2000 + Search.CHECK_INTERVAL)
+
+    def test_staged_moves(self):
+
+        for chess_board in (self.ChessBoard_2, self.ChessBoard_4, self.ChessBoard_5):
+            legal = sorted(chess_board.position.legal_moves())
+            quiet = [move for move in legal if not Move.is_capture(move) and not Move.is_promotion(move)]
+            hash_move, killer = quiet[-1], quiet[0]
+
+            staged = list(chess_board.staged_moves(hash_move, [killer]))
+            self.assertEqual(sorted(staged), legal)
+            self.assertEqual(staged[0], hash_move)
+
+            captures = [move for move in legal if Move.is_capture(move) or Move.is_promotion(move)]
+            self.assertEqual(sorted(staged[1:len(captures) + 1]), captures)
+            self.assertEqual(staged[len(captures) + 1], killer)
+
+        # stalemate, checkmate and a position where only the king can move
+        for fen, moves in (("7k/5Q2/8/8/8/8/8/K7 b - - 0 1", False), ("R6k/8/6K1/8/8/8/8/8 b - - 0 1", False),
+                           ("7k/8/8/8/8/8/8/K6r w - - 0 1", True)):
+            self.assertEqual(ChessBoard.ChessBoard(fen).position.has_legal_move(), moves)
+
+    def test_move_ordering(self):
+
+        position = self.ChessBoard_2.position
+        moves = position.legal_moves()
+        quiet = [move for move in moves if Move.flags(move) == Move.QUIET]
+        hash_move, killer = quiet[0], quiet[1]
+
+        orderer = MoveOrdering.MoveOrderer()
+        orderer.add_cutoff(killer, 3, 2)
+        ordered = orderer.order(position, moves, 3, hash_move)
+        self.assertEqual(sorted(ordered), sorted(moves))
+        self.assertEqual(ordered[0], hash_move)
+
+        # captures come next, most valuable victim first, and the killer right after them
+        captures = [move for move in ordered if Move.is_capture(move)]
+        self.assertEqual(ordered[1:len(captures) + 1], captures)
+        victims = [MoveOrdering.PIECE_VALUES[position.squares[(move >> 6) & 63] % 6] for move in captures]
+        self.assertEqual(victims, sorted(victims, reverse=True))
+        self.assertEqual(ordered[len(captures) + 1], killer)
+
+    def test_static_exchange(self):
+
+        # a pawn that is only defended by a rook, a knight taking a pawn defended by a knight with more pieces behind
+        # both, and a queen taking a pawn defended by a pawn
+        for fen, move, gain in (("1k1r4/1pp4p/p7/4p3/8/P5P1/1PP4P/2K1R3 w - - 0 1", "e1e5", 82),
+                                ("1k1r3q/1ppn3p/p4b2/4p3/8/P2N2P1/1PP1R1BP/2K1Q3 w - - 0 1", "d3e5", 82 - 337),
+                                ("4k3/8/2p5/3p4/4Q3/8/8/4K3 w - - 0 1", "e4d5", 82 - 1025)):
+            position = ChessBoard.ChessBoard(fen).position
+            code = [code for code in position.legal_moves() if Bitboard.move_name(code) == move][0]
+            self.assertEqual(position.see(code), gain)
+
+    def test_quiescence(self):
+
+        # at depth 1 the queen would take the pawn if the search stopped before the recapture
+        result = Search.search(ChessBoard.ChessBoard("4k3/8/2p5/3p4/4Q3/8/8/4K3 w - - 0 1"), max_depth=1)
+        self.assertNotEqual(Bitboard.move_name(result.move), "e4d5")
+
+        # Kiwipete's capture sequences stay bounded
+        result = Search.search(self.ChessBoard_2, max_depth=3)
+        self.assertLess(result.nodes, 50000)
+
+    def test_opening_book(self):
+
+        # keys from the Polyglot book format description
+        position = Bitboard.Position()
+        keys = [0x463b96181691fc9c, 0x823c9b50fd114196, 0x0756b94461c50fb0, 0x662fafb965db29d4, 0x22a48b5a8e47ff78,
+                0x652a607ca3f242c1, 0x00fdd303c946bdd9]
+        for move, key in zip(["", "e2e4", "d7d5", "e4e5", "f7f5", "e1e2", "e8f7"], keys):
+            if move:
+                position.make_move([code for code in position.legal_moves() if Bitboard.move_name(code) == move][0])
+            self.assertEqual(OpeningBook.polyglot_hash(position), key)
+
+        castling_board = ChessBoard.ChessBoard("r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1")
+        start_moves = {code: weight for code, weight in zip(self.ChessBoard_1.position.legal_moves()[:3], [1, 0, 3])}
+        castle = [code for code in castling_board.position.legal_moves() if Move.is_castling(code)][0]
+        entries = [(OpeningBook.polyglot_hash(self.ChessBoard_1.position), OpeningBook.encode_move(code), weight, 0)
+                   for code, weight in start_moves.items()]
+        entries.append((OpeningBook.polyglot_hash(castling_board.position), OpeningBook.encode_move(castle), 1, 0))
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "book.bin")
+            with open(path, "wb") as file:
+                for entry in sorted(entries):
+                    file.write(OpeningBook.ENTRY.pack(*entry))
+
+            with OpeningBook.OpeningBook(path) as book:
+                self.assertEqual(dict(book.get_moves(self.ChessBoard_1.position)), start_moves)
+                self.assertEqual(book.get_moves(castling_board.position), [(castle, 1)])
+                self.assertEqual(book.get_moves(self.ChessBoard_2.position), [])
+
+                # a move with no weight is never picked
+                picked = {book.choose_move(self.ChessBoard_1.position) for _ in range(50)}
+                self.assertEqual(picked, {code for code, weight in start_moves.items() if weight})
+                self.assertTrue(book.choose(castling_board).castling)
+
+    def test_background_search(self):
+
+        engine = Search.BackgroundSearch()
+        start_hash = self.ChessBoard_2.get_hash()
+
+        # a cancelled search never hands back its result
+        engine.start(self.ChessBoard_2.position, time_limit=10)
+        engine.cancel()
+        self.assertFalse(engine.is_thinking())
+
+        engine.start(self.ChessBoard_2.position, max_depth=2)
+        result = None
+        for _ in range(500):
+            result = engine.get_result()
+            if result:
+                break
+            time.sleep(0.01)
+        self.assertEqual(result.depth, 2)
+        self.assertIsNone(engine.get_result())
+        self.assertEqual(self.ChessBoard_2.get_hash(), start_hash)
+
+    def test_move_codes(self):
+
+        # every code a ChessBoard move encodes to is the code the generator produced for it
+        for chess_board in (self.ChessBoard_2, self.ChessBoard_4, self.ChessBoard_5):
+            position = chess_board.position
+            for code in position.legal_moves():
+                self.assertLess(code, 1 << 16)
+                move = chess_board.build_move(code)
+                self.assertEqual(ChessBoard.encode_move(position, move), code)
+
+    def test_rules_do_not_import_pygame(self):
+
+        code = "import sys, ChessBoard, Perft, Benchmark; ChessBoard.ChessBoard(); print('pygame' in sys.modules)"
+        output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+        self.assertEqual(output.split()[-1], "False")
+
+    def test_legal_move_generator(self):
+
+        # Legal moves generated from pins and checks should match filtering pseudo-legal moves by making them
+        def filtered_moves(position):
+            side = position.side
+            moves = []
+            for move in position.generate_moves():
+                position.make_move(move)
+                if not position.king_attacked(side):
+                    moves.append(move)
+                position.unmake_move()
+            return sorted(moves)
+
+        def compare(position, depth):
+            moves = sorted(position.legal_moves())
+            self.assertEqual(moves, filtered_moves(position))
+            if depth > 1:
+                for move in moves:
+                    position.make_move(move)
+                    compare(position, depth - 1)
+                    position.unmake_move()
+
+        fens = ["8/8/8/K2Pp2r/8/8/8/7k w - e6 0 1",  # en passant would uncover a rook check along the row
+                "8/8/8/3k4/2Pp4/8/8/4K3 b - c3 0 1",  # en passant captures the checking pawn
+                "8/8/4k3/8/2pPp3/8/B7/4K3 b - d3 0 1",  # one capturing pawn is pinned by the bishop
+                "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1"]
+        for fen in fens:
+            compare(ChessBoard.ChessBoard(fen).position, 3)
+
+    def test_object_backend(self):
+
+        chess_board = ChessBoard.ChessBoard("r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+                                            bitboards=False)
+        res = Perft.move_number_test(chess_board, 2)
+        self.assertEqual(res, (264, 87, 0, 6, 48, 10, 0))
+
+    def test_attack_queries(self):
+
+        for chess_board in (self.ChessBoard_2, self.ChessBoard_4, self.ChessBoard_5):
+            position = chess_board.position
+            for square in range(64):
+                row, column = divmod(square, 8)
+                for color in (0, 1):
+                    self.assertEqual(Pieces.square_attacked(chess_board.board, row, column, color == 0),
+                                     position.is_square_attacked(square, color))
+                    self.assertEqual(bool(position.attacks_by(color) >> square & 1),
+                                     position.is_square_attacked(square, color))
 
 
 def main(fen=None):
@@ -122,7 +526,7 @@ def main(fen=None):
     print("----------------------------------------------------------")
     print("Nodes, captures, en_passants, castles, promotions, checks, checkmates")
 
-    print(move_number_test(chess_board, 1))
+    print(Perft.move_number_test(chess_board, 1))
 
 if __name__ == "__main__":
     #fen = "r5k1/1P6/8/8/8/8/1p6/2R4K"